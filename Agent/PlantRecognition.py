@@ -1,15 +1,23 @@
+import asyncio
 import base64
 import mimetypes
 import os
 import io
+import threading
 from typing import Union
 
 import cv2
 import numpy as np
-from langchain_core.messages import SystemMessage
-from langchain_openai import ChatOpenAI
+from loguru import logger
 from pydantic import BaseModel, Field, ValidationError
 
+from Agent.cache import ResponseCache
+from Agent.payload import PayloadOptimizer, budget_for, crop_to_box
+from Common.image_descriptors import hamming, phash
+
+# Bump when the prompt changes, so answers to the old prompt are no longer reused
+PROMPT_VERSION = 1
+
 class PlantRecognitionResult(BaseModel):
     """Always use this tool to structure your response to the user."""
     plant_name: str = Field(description="The name of the plant.")
@@ -23,7 +31,16 @@ class PlantRecognitionAgent:
         base_url: str = None,
         model="gemini-2.5-pro",
         enable_llm: bool = True,
+        cache_path: str = "Data/cache/recognition.json",
+        cache_ttl: float = 7 * 86400,
+        max_hash_distance: int = 6,
     ):
+        self.model_name = model
+        self.max_hash_distance = max_hash_distance
+        self.cache = ResponseCache(cache_path, ttl=cache_ttl)
+        self.payload = PayloadOptimizer(budget_for(model))
+        self._loop = None
+        self._loop_lock = threading.Lock()
 
         resolved_api_key = api_key if api_key else os.getenv("OPENAI_API_KEY")
         resolved_base_url = base_url if base_url else os.getenv("OPENAI_API_BASE")
@@ -33,6 +50,9 @@ class PlantRecognitionAgent:
             self._model = None
             return
 
+        # langchain takes seconds to import, so it is only loaded once an agent is actually enabled
+        from langchain_openai import ChatOpenAI
+
         model = ChatOpenAI(
             base_url=resolved_base_url,
             api_key=resolved_api_key,
@@ -43,16 +63,90 @@ class PlantRecognitionAgent:
     def regocnize_plant(self, image_input: Union[str, np.ndarray]) -> PlantRecognitionResult:
         """
         Recognize plant from either file path or numpy array.
+        Near-duplicate images (perceptual hashes within `max_hash_distance` bits) of an
+        earlier request with the same model and prompt return the cached result.
         
         Args:
             image_input: Either a file path (str) or numpy array (BGR format)
         """
         if isinstance(image_input, str):
-            return self._recognize_from_path(image_input)
+            recognize = self._recognize_from_path
+            image = cv2.imread(image_input, cv2.IMREAD_REDUCED_GRAYSCALE_4) if os.path.isfile(image_input) else None
         elif isinstance(image_input, np.ndarray):
-            return self._recognize_from_array(image_input)
+            recognize = self._recognize_from_array
+            image = image_input
         else:
             raise ValueError("Input must be either a file path (str) or numpy array")
+
+        if image is None or image.size == 0:
+            return recognize(image_input)
+        key, cached = self._cached(image)
+        if cached is not None:
+            return cached
+
+        result = recognize(image_input)
+        self.cache.put(key, result.model_dump())
+        return result
+
+    def recognize_plants(self, images: dict, boxes: dict = None, concurrency: int = 4, timeout: float = 60) -> dict:
+        """
+        Recognize each plant's image concurrently, instead of tiling them into one request.
+
+        Args:
+            images: {plant id: numpy array (BGR format)}
+            boxes: {plant id: (x1, y1, x2, y2)} to crop each image to its plant before sending
+            concurrency: Most requests in flight at once
+            timeout: Seconds allowed for each request once it has started
+
+        Returns {plant id: PlantRecognitionResult, or None if that request failed or timed out}.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._recognize_all(images, boxes or {}, concurrency, timeout),
+                                                  self._event_loop())
+        return future.result()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """The agent's long-lived event loop, running on its own thread. ChatOpenAI keeps its async
+        HTTP client bound to the loop of its first request, so every request must use the same one."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="recognition-loop", daemon=True).start()
+            return self._loop
+
+    async def _recognize_all(self, images: dict, boxes: dict, concurrency: int, timeout: float) -> dict:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def recognize(plant_id, image):
+            async with semaphore:
+                try:
+                    return plant_id, await asyncio.wait_for(self.arecognize_plant(image, boxes.get(plant_id)), timeout)
+                except Exception as e:
+                    logger.warning(f"Recognition of plant {plant_id} failed: {e!r}")
+                    return plant_id, None
+
+        return dict(await asyncio.gather(*(recognize(plant_id, image) for plant_id, image in images.items())))
+
+    async def arecognize_plant(self, img_array: np.ndarray, box=None) -> PlantRecognitionResult:
+        """Async regocnize_plant for a numpy array (BGR format), optionally cropped to `box`, using the same cache."""
+        img_array = crop_to_box(img_array, box)
+        key, cached = self._cached(img_array)
+        if cached is not None:
+            return cached
+        self._check_model()
+        messages = self._messages(self._encode_array(img_array), "image/jpeg")
+        result = self._parse(await self._model.ainvoke(messages))
+        self.cache.put(key, result.model_dump())
+        return result
+
+    def _cached(self, image: np.ndarray) -> tuple[str, PlantRecognitionResult | None]:
+        """Cache key of `image`, and the result stored for it or for a near-duplicate."""
+        image_hash = phash(image)
+        prefix = f"{self.model_name}|{PROMPT_VERSION}|"
+        key = f"{prefix}{image_hash:016x}"
+        cached = self.cache.find(
+            lambda k: k.startswith(prefix) and hamming(int(k[len(prefix):], 16), image_hash) <= self.max_hash_distance,
+            key)
+        return key, None if cached is None else PlantRecognitionResult(**cached)
     
     def _recognize_from_path(self, img_path: str) -> PlantRecognitionResult:
         """Recognize plant from file path"""
@@ -63,29 +157,35 @@ class PlantRecognitionAgent:
             mime_type = mimetypes.guess_type(img_path)[0]
             if mime_type is None or not mime_type.startswith("image/"):
                 raise ValueError("The provided file is not a valid image.")
-        return self._process_image_data(image_data, mime_type or "image/jpeg")
+        image_data, reencoded = self.payload.encode_file(image_data)
+        return self._process_image_data(image_data, "image/jpeg" if reencoded else mime_type)
     
     def _recognize_from_array(self, img_array: np.ndarray) -> PlantRecognitionResult:
         """Recognize plant from numpy array (BGR format)"""
+        return self._process_image_data(self._encode_array(img_array), "image/jpeg")
+
+    def _encode_array(self, img_array: np.ndarray) -> bytes:
         if len(img_array.shape) != 3 or img_array.shape[2] != 3:
             raise ValueError("Image array must be 3D with shape (height, width, 3)")
-        
-        # Encode as JPEG
-        success, buffer = cv2.imencode('.jpg', img_array)
-        if not success:
-            raise ValueError("Failed to encode image array")
-        
-        image_data = buffer.tobytes()
-        return self._process_image_data(image_data, "image/jpeg")
+        return self.payload.encode(img_array)
     
     def _process_image_data(self, image_data: bytes, mime_type: str) -> PlantRecognitionResult:
         """Process image data and get plant recognition result"""
+        self._check_model()
+        response = self._model.invoke(self._messages(image_data, mime_type))
+        return self._parse(response)
+
+    def _check_model(self):
         if self._model is None:
             raise RuntimeError(
                 "PlantRecognitionAgent LLM is disabled or OPENAI_API_KEY is not set. "
                 "Set OPENAI_API_KEY to enable recognition."
             )
 
+    @staticmethod
+    def _messages(image_data: bytes, mime_type: str) -> list:
+        from langchain_core.messages import SystemMessage
+
         image_data_b64 = base64.b64encode(image_data).decode("utf-8")
         messages = [
             SystemMessage(
@@ -104,8 +204,10 @@ class PlantRecognitionAgent:
                 ],
             },
         ]
+        return messages
 
-        response = self._model.invoke(messages)
+    @staticmethod
+    def _parse(response) -> PlantRecognitionResult:
         try:
             result = PlantRecognitionResult.model_validate(response.tool_calls[0]["args"], strict=True)
         except ValidationError as e:
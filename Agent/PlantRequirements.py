@@ -2,16 +2,22 @@ import base64
 import json
 import mimetypes
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
 from typing import Annotated, Union
 
-import cv2
 import numpy as np
-import requests
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from loguru import logger
 from pydantic import BaseModel, Field
 
+from Agent.cache import ResponseCache
+from Agent.firecrawl import FirecrawlClient
+from Agent.payload import PayloadOptimizer, budget_for
+
+# Bump when the prompt or schema changes, so cached requirements are re-derived
+PROMPT_VERSION = 2
+
 
 # =========================
 # Result Schema
@@ -34,46 +40,30 @@ class PlantRequirementsResult(BaseModel):
 # =========================
 # Tool: Firecrawl Search
 # =========================
-@tool
 def firecrawl_search(query: Annotated[str, "Search query"]) -> str:
     """Search the web for plant care information."""
+    return FirecrawlClient().search(query)
 
-    api_key = os.getenv("FIRECRAWL_API_KEY")
-    if not api_key:
-        raise RuntimeError("FIRECRAWL_API_KEY not set in environment variables.")
-
-    url = "https://api.firecrawl.dev/v2/search"
-    payload = {
-        "query": query,
-        "limit": 2,
-        "sources": ["web"],
-        "timeout": 60000,
-        "scrapeOptions": {
-            "formats": ["summary"],
-            "onlyMainContent": True,
-        },
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    }
-
-    response = requests.post(url, json=payload, headers=headers, timeout=60)
-    result = response.json()
-
-    if not result.get("success", False):
-        raise ValueError(f"Firecrawl failed: {result.get('error')}")
 
-    pages = result.get("data", {}).get("web", [])
-    if not pages:
-        return "No relevant information found."
+def normalize_key(text: str) -> str:
+    """Lowercase `text` and reduce punctuation and whitespace to single spaces, e.g. 'Tomato,  Fruiting.' -> 'tomato fruiting'."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
 
-    markdown = ""
-    for page in pages:
-        markdown += f"### {page.get('title')}\n{page.get('summary')}\n\n"
 
-    return markdown
+def no_answer(explain: str) -> PlantRequirementsResult:
+    """Placeholder result (-1 everywhere) for when the model gave no usable answer."""
+    return PlantRequirementsResult(
+        plant_name="",
+        watering_frequency=-1,
+        watering_amount=-1,
+        light_type=0,
+        light_duration=-1,
+        temperature=-1,
+        fertilization_frequency=-1,
+        fertilization_amount=-1,
+        wind=-1,
+        explain=explain,
+    )
 
 
 # =========================
@@ -86,7 +76,25 @@ class PlantRequirementsAgent:
         base_url: str = None,
         model: str = "gpt-4o-mini",  # ⚠️ 如果你真用 Gemini，需要兼容 API
         enable_llm: bool = True,
+        cache_path: str = "Data/cache/requirements.json",
+        cache_ttl: float = 14 * 86400,
+        time_budget: float = 90,
+        token_budget: int = 30000,
+        max_rounds: int = 4,
     ):
+        self.model_name = model
+        # Bounds on one get_requirements call, so a slow search cannot hold up the periodic job
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+        self.max_rounds = max_rounds
+        # Model calls and searches get separate pools: an invoke abandoned at its timeout keeps
+        # its thread until the HTTP request ends, and must not hold up the searches
+        self._model_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="requirements-model")
+        self._search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="requirements-search")
+        # Requirements depend on what the plant is and its stage, not on the exact photo
+        self.cache = ResponseCache(cache_path, ttl=cache_ttl)
+        self.payload = PayloadOptimizer(budget_for(model))
+
         resolved_api_key = api_key or os.getenv("OPENAI_API_KEY")
         resolved_base_url = base_url or os.getenv("OPENAI_API_BASE")
 
@@ -95,11 +103,16 @@ class PlantRequirementsAgent:
             self._model = None
             return
 
+        # langchain takes seconds to import, so it is only loaded once an agent is actually enabled
+        from langchain_core.tools import tool
+        from langchain_openai import ChatOpenAI
+
         self._model = ChatOpenAI(
             api_key=resolved_api_key,
             base_url=resolved_base_url,
             model=model,
-        ).bind_tools([firecrawl_search, PlantRequirementsResult])
+            timeout=time_budget,  # an abandoned invoke frees its model thread by then at the latest
+        ).bind_tools([tool(firecrawl_search), PlantRequirementsResult])
 
     def get_requirements(
         self,
@@ -107,6 +120,24 @@ class PlantRequirementsAgent:
         growth_stage: str,
         details: str,
         image_input: Union[str, np.ndarray],
+    ) -> PlantRequirementsResult:
+        key = f"{self.model_name}|{PROMPT_VERSION}|{normalize_key(plant_name)}|{normalize_key(growth_stage)}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Requirements for {plant_name} ({growth_stage}) from cache, {self.cache.stats()}")
+            return PlantRequirementsResult(**cached)
+
+        result = self._derive_requirements(plant_name, growth_stage, details, image_input)
+        if result.plant_name:  # not the placeholder returned when the model gave no answer
+            self.cache.put(key, result.model_dump())
+        return result
+
+    def _derive_requirements(
+        self,
+        plant_name: str,
+        growth_stage: str,
+        details: str,
+        image_input: Union[str, np.ndarray],
     ) -> PlantRequirementsResult:
         if self._model is None:
             raise RuntimeError(
@@ -121,14 +152,12 @@ class PlantRequirementsAgent:
             if not os.path.isfile(image_input):
                 raise FileNotFoundError(image_input)
             with open(image_input, "rb") as f:
-                image_data = f.read()
-            mime_type = mimetypes.guess_type(image_input)[0] or mime_type
+                image_data, reencoded = self.payload.encode_file(f.read())
+            if not reencoded:
+                mime_type = mimetypes.guess_type(image_input)[0] or mime_type
 
         elif isinstance(image_input, np.ndarray):
-            ok, buffer = cv2.imencode(".jpg", image_input)
-            if not ok:
-                raise ValueError("Failed to encode image")
-            image_data = buffer.tobytes()
+            image_data = self.payload.encode(image_input)
 
         else:
             raise TypeError("image_input must be str or np.ndarray")
@@ -139,7 +168,8 @@ class PlantRequirementsAgent:
                 "role": "system",
                 "content": (
                     "You are a plant care expert. "
-                    "Always return structured JSON using the provided schema."
+                    "Use firecrawl_search if you need to look up care information, "
+                    "then always return structured JSON using the provided schema."
                 ),
             },
             {
@@ -163,28 +193,75 @@ class PlantRequirementsAgent:
             },
         ]
 
-        response = self._model.invoke(messages)
-
-        # ---------- Tool handling ----------
-        if not response.tool_calls:
-            logger.warning("No tool calls returned.")
-            return PlantRequirementsResult(
-                plant_name="",
-                watering_frequency=-1,
-                watering_amount=-1,
-                light_type=0,
-                light_duration=-1,
-                temperature=-1,
-                fertilization_frequency=-1,
-                fertilization_amount=-1,
-                wind=-1,
-                explain="No valid response.",
-            )
+        # ---------- Agent loop ----------
+        # Run the searches the model asks for and feed the results back until it answers
+        # with PlantRequirementsResult, or the time/token budget or round limit runs out.
+        deadline = time.monotonic() + self.time_budget
+        tokens = 0
+        for _ in range(self.max_rounds):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = self._model_executor.submit(self._model.invoke, messages).result(timeout=remaining)
+            except TimeoutError:
+                break
+            tokens += (getattr(response, "usage_metadata", None) or {}).get("total_tokens", 0)
+
+            if not response.tool_calls:
+                logger.warning("No tool calls returned.")
+                return no_answer("No valid response.")
+            logger.debug(response.tool_calls)
+
+            for call in response.tool_calls:
+                if call["name"] == PlantRequirementsResult.__name__:
+                    try:
+                        return PlantRequirementsResult.model_validate(call["args"], strict=True)
+                    except Exception as e:
+                        logger.warning(f"Invalid model output: {e}")
+                        return no_answer("Invalid model output.")
+
+            if tokens >= self.token_budget:
+                break
+            messages.append(response)
+            messages.extend(self._run_tools(response.tool_calls, deadline))
+
+        logger.warning(f"Requirements agent out of budget after {time.monotonic() - deadline + self.time_budget:.1f} s, "
+                       f"{tokens} tokens")
+        return no_answer("Out of time or token budget.")
+
+    def _run_tools(self, tool_calls: list[dict], deadline: float) -> list:
+        """Execute the requested searches concurrently. Errors and timeouts are reported back
+        to the model as the tool result instead of failing the request."""
+        from langchain_core.messages import ToolMessage
 
-        logger.debug(response.tool_calls)
+        futures = {}
+        errors = {}
+        for call in tool_calls:
+            if call["name"] != "firecrawl_search":
+                continue
+            query = (call.get("args") or {}).get("query")
+            if not isinstance(query, str) or not query.strip():
+                logger.warning(f"firecrawl_search called without a query: {call.get('args')}")
+                errors[call["id"]] = "Search failed: a non-empty 'query' argument is required."
+                continue
+            search_deadline = max(0.1, deadline - time.monotonic())
+            futures[call["id"]] = self._search_executor.submit(FirecrawlClient().search, query, deadline=search_deadline)
+        wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
 
-        try:
-            args = response.tool_calls[0]["args"]
-            return PlantRequirementsResult.model_validate(args, strict=True)
-        except Exception as e:
-            raise ValueError(f"Invalid model output: {e}")
+        results = []
+        for call in tool_calls:
+            future = futures.get(call["id"])
+            if call["id"] in errors:
+                content = errors[call["id"]]
+            elif future is None:
+                content = f"Unknown tool {call['name']}."
+            elif not future.done():
+                future.cancel()
+                content = "Search timed out."
+            elif future.exception() is not None:
+                content = f"Search failed: {future.exception()}"
+            else:
+                content = future.result()
+            results.append(ToolMessage(content=content, tool_call_id=call["id"]))
+        return results
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+
+class ResponseCache:
+    """Small persistent LRU cache of JSON-serializable agent results, with a TTL.
+
+    Entries live in memory in least-recently-used order and the whole cache is written
+    to `path` (temporary file, then rename) after each put, so it survives restarts.
+    Hits and misses are counted for stats().
+    """
+
+    def __init__(self, path: str, ttl: float = None, max_entries: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache {self.path}: {e}")
+            return
+        for key, stored_at, value in entries:
+            if not self._expired(stored_at):
+                self._entries[key] = (stored_at, value)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump([[key, stored_at, value] for key, (stored_at, value) in self._entries.items()], f)
+        os.replace(tmp, self.path)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key: str):
+        """The value stored under `key`, or None if missing or expired."""
+        return self.find(lambda candidate: False, key)
+
+    def find(self, match, key: str = None):
+        """The value of the exact `key` if present, else of the most recently used key for which
+        `match(key)` is true, or None."""
+        with self._lock:
+            candidates = [key] if key in self._entries else []
+            candidates += [k for k in reversed(self._entries) if k != key and match(k)]
+            for candidate in candidates:
+                stored_at, value = self._entries[candidate]
+                if self._expired(stored_at):
+                    del self._entries[candidate]
+                    continue
+                self._entries.move_to_end(candidate)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Failed to write cache {self.path}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
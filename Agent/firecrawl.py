@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from Agent.cache import ResponseCache
+from Common.singleton import Singleton
+
+FIRECRAWL_URL = "https://api.firecrawl.dev"
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class FirecrawlClient(metaclass=Singleton):
+    """Firecrawl web search over one keep-alive session, with a persistent result cache.
+
+    Identical queries are answered from the cache for `ttl` seconds. Concurrent calls
+    for the same query share a single request. Every call has a deadline of `deadline`
+    seconds: callers stop waiting for the shared request once it passes, and the request
+    itself gives up reading a response still arriving by then. The endpoint
+    comes from FIRECRAWL_API_BASE, so tests can point it at Agent.firecrawl_stub.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, cache_path: str = "Data/cache/firecrawl.json",
+                 ttl: float = 3 * 86400, deadline: float = 20, connect_timeout: float = 3.05, pool_size: int = 4):
+        self.api_key = api_key or os.getenv("FIRECRAWL_API_KEY")
+        self.base_url = (base_url or os.getenv("FIRECRAWL_API_BASE") or FIRECRAWL_URL).rstrip("/")
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.cache = ResponseCache(cache_path, ttl=ttl)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="firecrawl")
+        self._lock = threading.Lock()
+        self._in_flight = {}  # cache key -> Future of the request being made
+
+    def search(self, query: str, limit: int = 2, deadline: float = None) -> str:
+        """Markdown with the title and summary of the top `limit` pages for `query`."""
+        key = f"{limit}|{normalize_query(query)}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        deadline = deadline or self.deadline
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = self._executor.submit(self._fetch, key, query, limit, deadline)
+        try:
+            return future.result(timeout=deadline)
+        except TimeoutError:
+            raise TimeoutError(f"Firecrawl search '{query}' exceeded its {deadline} s deadline") from None
+
+    def _fetch(self, key: str, query: str, limit: int, deadline: float) -> str:
+        try:
+            markdown = self._search(query, limit, deadline)
+            self.cache.put(key, markdown)
+            return markdown
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _search(self, query: str, limit: int, deadline: float) -> str:
+        if not self.api_key:
+            raise RuntimeError("FIRECRAWL_API_KEY not set in environment variables.")
+
+        start = time.perf_counter()
+        give_up = time.monotonic() + deadline
+        payload = {
+            "query": query,
+            "limit": limit,
+            "sources": ["web"],
+            "timeout": int(deadline * 1000),  # let Firecrawl give up before we do
+            "scrapeOptions": {
+                "formats": ["summary"],
+                "onlyMainContent": True,
+            },
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        # The read timeout applies per socket read, so a server dribbling out the body could
+        # outlast it; the body is read as it arrives (read1) and checked against the deadline
+        with self.session.post(f"{self.base_url}/v2/search", json=payload, headers=headers,
+                               timeout=(self.connect_timeout, deadline), stream=True) as response:
+            body = bytearray()
+            while chunk := response.raw.read1(16384, decode_content=True):
+                body += chunk
+                if time.monotonic() > give_up:
+                    raise TimeoutError(f"Firecrawl search '{query}' exceeded its {deadline} s deadline")
+        result = json.loads(body)
+        logger.debug(f"Firecrawl search '{query}' took {time.perf_counter() - start:.2f} s")
+
+        if not result.get("success", False):
+            raise ValueError(f"Firecrawl failed: {result.get('error')}")
+
+        pages = result.get("data", {}).get("web", [])
+        if not pages:
+            return "No relevant information found."
+
+        markdown = ""
+        for page in pages:
+            markdown += f"### {page.get('title')}\n{page.get('summary')}\n\n"
+        return markdown
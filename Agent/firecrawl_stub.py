@@ -0,0 +1,64 @@
+"""Local stand-in for the Firecrawl search API, for tests and offline runs.
+
+    python -m Agent.firecrawl_stub --port 8765
+    FIRECRAWL_API_BASE=http://127.0.0.1:8765 FIRECRAWL_API_KEY=test python main.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if self.path != "/v2/search":
+            self._reply(404, {"success": False, "error": "Not found"})
+            return
+        request = json.loads(body or b"{}")
+        query = request.get("query", "")
+        with server.lock:
+            server.requests.append(query)
+        time.sleep(server.delay)
+        pages = [{"title": f"Result {i + 1} for {query}", "summary": f"Care notes about {query}."}
+                 for i in range(request.get("limit", 2))]
+        self._reply(200, {"success": True, "data": {"web": pages}})
+
+    def _reply(self, status: int, result: dict):
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 0, delay: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub on a background thread. Its URL is `server.url`, the queries it got `server.requests`."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.delay = delay
+    server.requests = []
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    args = parser.parse_args()
+    stub = serve(args.port, args.delay)
+    print(f"Firecrawl stub listening on {stub.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.shutdown()
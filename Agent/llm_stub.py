@@ -0,0 +1,131 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint, for tests and benchmarks.
+
+    python -m Agent.llm_stub --port 8766 --latency 0.8
+    OPENAI_API_BASE=http://127.0.0.1:8766/v1 OPENAI_API_KEY=test python main.py
+
+It answers the tool-calling requests the agents make with `ChatOpenAI(...).bind_tools`:
+recognition requests get a canned PlantRecognitionResult call, requirements requests a
+PlantRequirementsResult call (optionally preceded by one firecrawl_search round).
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECOGNITION = {
+    "plant_name": "Tomato",
+    "details": "Healthy plant with several green fruit.",
+    "growth_stage": "fruiting",
+}
+
+REQUIREMENTS = {
+    "plant_name": "Tomato",
+    "watering_frequency": 2.0,
+    "watering_amount": 150.0,
+    "light_type": 2,
+    "light_duration": 14.0,
+    "temperature": 24.0,
+    "fertilization_frequency": 14.0,
+    "fertilization_amount": 10.0,
+    "wind": 20.0,
+    "explain": "Canned answer from the local LLM stub.",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if not self.path.endswith("/chat/completions"):
+            self._reply(404, {"error": {"message": "Not found"}})
+            return
+        request = json.loads(body or b"{}")
+        name, args = self._answer(request)
+        # Latency grows with the upload, like a real endpoint decoding the images
+        time.sleep(server.latency + server.latency_per_mb * len(body) / 1e6)
+
+        prompt_tokens = len(body) // 4
+        call_id = next(server.ids)
+        reply = {
+            "id": f"chatcmpl-{call_id}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": f"call_{call_id}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(args)},
+                    }],
+                },
+                "finish_reason": "tool_calls",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 50, "total_tokens": prompt_tokens + 50},
+        }
+        sent = self._reply(200, reply)
+        with server.lock:
+            server.requests += 1
+            server.bytes_received += len(body)
+            server.bytes_sent += sent
+
+    def _answer(self, request: dict) -> tuple[str, dict]:
+        tools = {tool["function"]["name"] for tool in request.get("tools", [])}
+        if "PlantRecognitionResult" in tools:
+            return "PlantRecognitionResult", self.server.recognition
+        searched = any(message.get("role") == "tool" for message in request.get("messages", []))
+        if self.server.search and "firecrawl_search" in tools and not searched:
+            return "firecrawl_search", {"query": f"{self.server.requirements['plant_name']} care"}
+        return "PlantRequirementsResult", self.server.requirements
+
+    def _reply(self, status: int, result: dict) -> int:
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 0, latency: float = 0.0, latency_per_mb: float = 0.0, search: bool = False,
+          recognition: dict = None, requirements: dict = None) -> ThreadingHTTPServer:
+    """Start the stub on a background thread. Point ChatOpenAI at `server.url`; `server.requests`,
+    `bytes_received` and `bytes_sent` count the traffic."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.latency = latency
+    server.latency_per_mb = latency_per_mb
+    server.search = search
+    server.recognition = recognition or RECOGNITION
+    server.requirements = requirements or REQUIREMENTS
+    server.ids = itertools.count(1)
+    server.lock = threading.Lock()
+    server.requests = server.bytes_received = server.bytes_sent = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--latency-per-mb", type=float, default=0.0, help="extra seconds per MB of request body")
+    parser.add_argument("--search", action="store_true", help="ask for one firecrawl_search before answering")
+    args = parser.parse_args()
+    stub = serve(args.port, args.latency, args.latency_per_mb, args.search)
+    print(f"LLM stub listening on {stub.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.shutdown()
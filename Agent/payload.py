@@ -0,0 +1,102 @@
+import threading
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+
+class ImageBudget(NamedTuple):
+    max_pixels: int  # images are downscaled to at most this many pixels
+    max_bytes: int  # quality, then size, is stepped down until the JPEG fits
+    quality: int = 85
+    min_quality: int = 55
+
+
+# Past these sizes the providers downscale or tile on their side, so the extra bytes only cost upload time
+PROVIDER_BUDGETS = {
+    'openai': ImageBudget(max_pixels=1024 * 768, max_bytes=250_000),
+    'gemini': ImageBudget(max_pixels=768 * 768, max_bytes=200_000),
+}
+DEFAULT_BUDGET = ImageBudget(max_pixels=1024 * 768, max_bytes=250_000)
+
+
+def budget_for(model: str) -> ImageBudget:
+    """Budget of the provider serving `model`, guessed from its name."""
+    name = model.lower()
+    if 'gemini' in name:
+        return PROVIDER_BUDGETS['gemini']
+    if name.startswith(('gpt', 'o1', 'o3', 'o4')):
+        return PROVIDER_BUDGETS['openai']
+    return DEFAULT_BUDGET
+
+
+def crop_to_box(image: np.ndarray, box=None, margin: float = 0.15) -> np.ndarray:
+    """The part of `image` inside `box` (x1, y1, x2, y2) grown by `margin` of its size on each side."""
+    if box is None:
+        return image
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = box
+    dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+    x1, y1 = max(0, int(x1 - dx)), max(0, int(y1 - dy))
+    x2, y2 = min(width, int(x2 + dx)), min(height, int(y2 + dy))
+    if x2 <= x1 or y2 <= y1:
+        return image
+    return image[y1:y2, x1:x2]
+
+
+class PayloadOptimizer:
+    """Shrinks images before they are base64-encoded into a prompt, and counts the bytes sent."""
+
+    def __init__(self, budget: ImageBudget = DEFAULT_BUDGET):
+        self.budget = budget
+        self.images = 0
+        self.bytes_in = 0  # raw pixels, or file size for files
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def encode(self, image: np.ndarray, box=None, source_bytes: int = None) -> bytes:
+        """JPEG of `image` (BGR), cropped to `box` if given, within the budget."""
+        source_bytes = image.nbytes if source_bytes is None else source_bytes
+        image = crop_to_box(image, box)
+        height, width = image.shape[:2]
+        scale = min(1.0, (self.budget.max_pixels / (width * height)) ** 0.5)
+        while True:
+            if scale < 1.0:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                resized = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            else:
+                resized = image
+            for quality in range(self.budget.quality, self.budget.min_quality - 1, -10):
+                ok, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if not ok:
+                    raise ValueError("Failed to encode image array")
+                if buffer.nbytes <= self.budget.max_bytes:
+                    break
+            if buffer.nbytes <= self.budget.max_bytes or min(resized.shape[:2]) <= 64:
+                break
+            scale *= 0.75
+        self._count(source_bytes, buffer.nbytes)
+        logger.debug(f"Image payload {width}x{height} -> {resized.shape[1]}x{resized.shape[0]} q{quality}, "
+                     f"{buffer.nbytes / 1024:.0f} KiB")
+        return buffer.tobytes()
+
+    def encode_file(self, data: bytes) -> tuple[bytes, bool]:
+        """`data` as is if it already fits the byte budget, else re-encoded. Returns (bytes, re-encoded)."""
+        if len(data) <= self.budget.max_bytes:
+            self._count(len(data), len(data))
+            return data, False
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._count(len(data), len(data))
+            return data, False
+        return self.encode(image, source_bytes=len(data)), True
+
+    def _count(self, bytes_in: int, bytes_sent: int):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_sent += bytes_sent
+
+    def stats(self) -> dict:
+        return {'images': self.images, 'bytes_in': self.bytes_in, 'bytes_sent': self.bytes_sent}
@@ -0,0 +1 @@
+"""Load tests and benchmarks for the PlantBox services. Run each module with `python -m Benchmarks.<name>`."""
@@ -0,0 +1,114 @@
+"""End-to-end latency of the agent pipeline against local stand-ins for the LLM and Firecrawl.
+
+    python -m Benchmarks.agent_latency --runs 20 --plants 6 --latency 0.8 --latency-per-mb 0.5
+
+Each run recognizes `--plants` synthetic plant photos (recognize_plants) and asks for the
+requirements of the first recognized one, as job() does. Caches are cleared between runs unless
+`--cache` is given. Prints p50/p95 per stage, the failed calls and the bytes exchanged with the LLM stub.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def synthetic_plants(count, width=640, height=480):
+    """Distinct smooth photos with a green blob, so each gets its own perceptual hash."""
+    rng = np.random.default_rng(0)
+    images, boxes = {}, {}
+    for n in range(count):
+        image = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (31, 31), 0)
+        x, y = int(rng.integers(100, width - 200)), int(rng.integers(100, height - 200))
+        cv2.ellipse(image, (x + 50, y + 50), (60, 45), 0, 0, 360, (40, 170, 60), -1)
+        images[n], boxes[n] = image, (x - 10, y - 10, x + 110, y + 110)
+    return images, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--plants', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.5, help='LLM stub seconds per request')
+    parser.add_argument('--latency-per-mb', type=float, default=0.5, help='LLM stub seconds per MB uploaded')
+    parser.add_argument('--search-latency', type=float, default=0.3, help='Firecrawl stub seconds per search')
+    parser.add_argument('--no-search', action='store_true', help='answer requirements without a search round')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--cache', action='store_true', help='keep the agent caches between runs')
+    parser.add_argument('--model', default='gemini-2.5-pro')
+    args = parser.parse_args()
+
+    from Agent import firecrawl_stub, llm_stub
+    from Agent.firecrawl import FirecrawlClient
+    from Agent.payload import crop_to_box
+    from Agent.PlantRecognition import PlantRecognitionAgent
+    from Agent.PlantRequirements import PlantRequirementsAgent
+
+    llm = llm_stub.serve(latency=args.latency, latency_per_mb=args.latency_per_mb, search=not args.no_search)
+    search = firecrawl_stub.serve(delay=args.search_latency)
+    cache_dir = tempfile.mkdtemp(prefix='agent-bench-')
+    FirecrawlClient(api_key='bench', base_url=search.url, cache_path=os.path.join(cache_dir, 'firecrawl.json'))
+    recognition = PlantRecognitionAgent(api_key='bench', base_url=llm.url, model=args.model,
+                                        cache_path=os.path.join(cache_dir, 'recognition.json'))
+    requirements = PlantRequirementsAgent(api_key='bench', base_url=llm.url, model=args.model,
+                                          cache_path=os.path.join(cache_dir, 'requirements.json'))
+    images, boxes = synthetic_plants(args.plants)
+
+    times = {'recognition': [], 'requirements': [], 'total': []}
+    failures = {'recognition': 0, 'requirements': 0, 'runs without a recognition': 0}
+    for _ in range(args.runs):
+        if not args.cache:
+            recognition.cache.clear()
+            requirements.cache.clear()
+            FirecrawlClient().cache.clear()
+        start = time.perf_counter()
+        results = recognition.recognize_plants(images, boxes, concurrency=args.concurrency)
+        recognized = time.perf_counter()
+        times['recognition'].append(recognized - start)
+        failures['recognition'] += sum(r is None for r in results.values())
+        n, result = next(((n, r) for n, r in results.items() if r is not None), (None, None))
+        if result is None:
+            print("no successful recognitions")
+            failures['runs without a recognition'] += 1
+            continue
+        try:
+            answer = requirements.get_requirements(result.plant_name, result.growth_stage, result.details,
+                                                   crop_to_box(images[n], boxes[n]))
+        except Exception as e:
+            print(f"requirements failed: {e!r}")
+            answer = None
+        if answer is None or not answer.plant_name:  # the no_answer() placeholder counts as a failure
+            failures['requirements'] += 1
+        done = time.perf_counter()
+        times['requirements'].append(done - recognized)
+        times['total'].append(done - start)
+
+    print(f"{args.runs} runs, {args.plants} plants, concurrency {args.concurrency}, model {args.model}")
+    print(f"{'stage':>14} {'p50 s':>8} {'p95 s':>8} {'mean s':>8}")
+    for stage, values in times.items():
+        mean = statistics.mean(values) if values else float('nan')
+        print(f"{stage:>14} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} {mean:>8.3f}")
+    print(f"Failed: recognition {failures['recognition']}/{args.runs * args.plants} calls, "
+          f"requirements {failures['requirements']}/{len(times['requirements'])} calls, "
+          f"{failures['runs without a recognition']}/{args.runs} runs without a recognition")
+    print(f"LLM requests {llm.requests}, searches {len(search.requests)}")
+    print(f"LLM bytes up {llm.bytes_received / args.runs / 1024:.1f} KiB/run, "
+          f"down {llm.bytes_sent / args.runs / 1024:.1f} KiB/run")
+    for name, agent in (('recognition', recognition), ('requirements', requirements)):
+        stats = agent.payload.stats()
+        print(f"{name} images {stats['images']}, raw {stats['bytes_in'] / 1e6:.1f} MB, "
+              f"sent {stats['bytes_sent'] / 1e6:.2f} MB")
+
+    llm.shutdown()
+    search.shutdown()
+
+
+if __name__ == '__main__':
+    main()
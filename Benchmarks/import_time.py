@@ -0,0 +1,78 @@
+"""Import-time profile of the startup path, from `python -X importtime`.
+
+    python -m Benchmarks.import_time
+    python -m Benchmarks.import_time --modules app,Jobs,Agent.PlantRequirements --top 30
+
+Each module is imported in a fresh interpreter. For each one this prints the wall time,
+the cumulative import time, and the slowest top-level packages it pulled in. It flags the
+heavy dependencies that should only load on first use (ultralytics, torch, sklearn,
+langchain). Run it after touching imports to keep startup in seconds.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup path of main.py, cheapest first
+DEFAULT_MODULES = ('Common', 'Sensors', 'app', 'Agent.PlantRecognition', 'Agent.PlantRequirements', 'EnvActuator',
+                   'Yolo', 'Jobs', 'Jobs.pick')
+DEFERRED = ('ultralytics', 'torch', 'sklearn', 'langchain_core', 'langchain_openai', 'openai')
+
+
+def profile(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    """Wall seconds to import `module` in a fresh interpreter, and its (self us, cumulative us, name) rows."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+        raise RuntimeError(error)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name[1:].rstrip()))  # nesting shows as leading spaces
+    return wall, rows
+
+
+def by_package(rows, module: str) -> dict:
+    """Cumulative import time (own dependencies included) of each top-level package `module` pulled in."""
+    own = module.split('.')[0]
+    totals = {}
+    for _, cumulative_us, name in rows:
+        name = name.strip()
+        if '.' not in name and name != own and not name.startswith('_') and name not in ('site', 'encodings'):
+            totals[name] = max(totals.get(name, 0), cumulative_us)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', default=','.join(DEFAULT_MODULES))
+    parser.add_argument('--top', type=int, default=8, help='slowest packages listed per module')
+    args = parser.parse_args()
+
+    print(f"{'module':<26} {'wall s':>7} {'import s':>9}  slowest packages")
+    for module in args.modules.split(','):
+        try:
+            wall, rows = profile(module)
+        except RuntimeError as e:
+            print(f"{module:<26} {'-':>7} {'-':>9}  failed: {e}")
+            continue
+        total_s = sum(cumulative_us for _, cumulative_us, name in rows if name == name.lstrip()) / 1e6
+        totals = sorted(by_package(rows, module).items(), key=lambda item: -item[1])
+        slowest = ', '.join(f"{name} {us / 1e3:.0f} ms" for name, us in totals[:args.top])
+        print(f"{module:<26} {wall:>7.2f} {total_s:>9.2f}  {slowest}")
+        loaded = {name.strip().split('.')[0] for _, _, name in rows}
+        eager = [name for name in DEFERRED if name in loaded]
+        if eager:
+            print(f"{'':<26} {'':>7} {'':>9}  ! loads at import: {', '.join(eager)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Load test for the dashboard: MJPEG client count vs. delivered frame rate.
+
+Against a running box:
+    python -m Benchmarks.stream_load --url http://plantbox.local:5000 --clients 1,4,16
+
+Self-contained, with a synthetic camera and the server in this process:
+    python -m Benchmarks.stream_load --serve --async-mode gevent --clients 1,4,16,64
+
+Each step opens that many MJPEG connections (plus optional Socket.IO clients), counts the
+frames each one receives for `--duration` seconds and prints one row per step.
+"""
+import argparse
+import os
+import socket
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+BOUNDARY = b'--frame\r\n'
+
+
+class SyntheticCamera:
+    """Stands in for cv2.VideoCapture: a moving test pattern at a fixed frame rate."""
+
+    def __init__(self, width=640, height=480, fps=30):
+        self.fps = fps
+        self._base = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self._index = 0
+        self._next = time.monotonic()
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        self._next += 1 / self.fps
+        time.sleep(max(0.0, self._next - time.monotonic()))
+        self._index += 1
+        shift = self._index * 8 % self._base.shape[1]
+        if image is None or image.shape != self._base.shape:
+            image = np.empty_like(self._base)
+        # Same as np.roll(self._base, shift, axis=1), written into the caller's buffer like cv2 does
+        image[:, shift:] = self._base[:, :self._base.shape[1] - shift]
+        image[:, :shift] = self._base[:, self._base.shape[1] - shift:]
+        return True, image
+
+    def release(self):
+        pass
+
+
+def mjpeg_client(host, port, path, duration, results, index, read_delay=0.0):
+    """Count multipart frames received on one raw HTTP connection.
+
+    A `read_delay` makes this a slow client (a phone on bad Wi-Fi) that sleeps between small reads.
+    """
+    frames = 0
+    try:
+        sock = socket.create_connection((host, port), timeout=10)
+        if read_delay:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 12)
+        sock.sendall(f"GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+        tail = b''
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            if read_delay:
+                time.sleep(read_delay)
+            chunk = sock.recv(1 << 12 if read_delay else 1 << 16)
+            if not chunk:
+                break
+            data = tail + chunk
+            frames += data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+        sock.close()
+    except OSError as e:
+        print(f"client {index}: {e}")
+    results[index] = frames / duration
+
+
+def socketio_clients(url, count):
+    """Connect `count` Socket.IO clients that count 'status_update' events."""
+    import socketio
+
+    clients, received = [], [0] * count
+    for i in range(count):
+        client = socketio.Client()
+
+        def on_status(data, i=i):
+            received[i] += 1
+
+        client.on('status_update', on_status)
+        client.connect(url, wait_timeout=10)
+        clients.append(client)
+    return clients, received
+
+
+def serve(async_mode, port):
+    """Start the dashboard server in this process with a synthetic camera and sensor ticker."""
+    os.environ['PLANTBOX_ASYNC_MODE'] = async_mode
+    import app
+    from Sensors import SensorStream
+
+    app.state['camera'] = SyntheticCamera()
+    threading.Thread(target=app.run_flask_server, kwargs={'port': port}, daemon=True).start()
+
+    def sensor_ticker():
+        while True:
+            SensorStream().feed(f"T:{20 + time.time() % 5:.2f}")
+            time.sleep(0.1)
+
+    threading.Thread(target=sensor_ticker, daemon=True).start()
+    time.sleep(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/api/camera/stream')
+    parser.add_argument('--clients', default='1,2,4,8,16,32')
+    parser.add_argument('--sio-clients', type=int, default=0, help='Socket.IO clients kept connected during the run')
+    parser.add_argument('--slow-clients', type=int, default=0, help='throttled MJPEG clients added to every step')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--serve', action='store_true', help='run the server in-process with a synthetic camera')
+    parser.add_argument('--async-mode', default='threading', choices=('threading', 'gevent'))
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    if args.serve:
+        serve(args.async_mode, url.port)
+        print(f"Serving in-process with async_mode={args.async_mode}")
+
+    sio, sio_received = socketio_clients(args.url, args.sio_clients) if args.sio_clients else ([], [])
+
+    print(f"{'clients':>8} {'total fps':>10} {'min fps':>8} {'median fps':>11}"
+          + (f" {'slow client fps':>16}" if args.slow_clients else '')
+          + (f" {'status/s per sio client':>24}" if sio else ''))
+    for count in map(int, args.clients.split(',')):
+        results = [0.0] * count
+        slow_results = [0.0] * args.slow_clients
+        sio_before = list(sio_received)
+        threads = [threading.Thread(target=mjpeg_client, args=(url.hostname, url.port, args.path, args.duration, results, i))
+                   for i in range(count)]
+        threads += [threading.Thread(target=mjpeg_client,
+                                     args=(url.hostname, url.port, args.path, args.duration, slow_results, i, 0.05))
+                    for i in range(args.slow_clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        row = f"{count:>8} {sum(results):>10.1f} {min(results):>8.1f} {statistics.median(results):>11.1f}"
+        if args.slow_clients:
+            row += f" {statistics.median(slow_results):>16.1f}"
+        if sio:
+            rates = [(after - before) / args.duration for before, after in zip(sio_before, sio_received)]
+            row += f" {statistics.median(rates):>24.1f}"
+        print(row, flush=True)
+
+    for client in sio:
+        client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
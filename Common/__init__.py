@@ -1,4 +1,7 @@
 from .globalstate import GlobalState
 from .singleton import Singleton
-from .scheduler import scheduler
-from .serial import PlantBoxSerial
\ No newline at end of file
+from .scheduler import scheduler, timers
+from .serial import PlantBoxSerial
+from .state_store import StateStore, status_store
+from .job_runner import JobCancelled, JobRunner
+from .checkpoint import Checkpointer
@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+from loguru import logger
+
+from .image_descriptors import descriptor_distance
+from .singleton import Singleton
+from .state_store import status_store
+
+
+class ChangeGate(metaclass=Singleton):
+    """Decides whether the plants changed enough since the last agent run to ask the agents again.
+
+    The reference is the per-plant descriptors of the run that last called the agents,
+    not the previous run, so slow drift still adds up to a refresh. A refresh is also
+    forced when the set of plants changes or the stored result is older than `max_age`.
+    """
+
+    def __init__(self, threshold: float = 0.25, max_age: float = 3 * 86400):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.reference = {}  # plant id -> descriptor
+        self.result = None  # requirements of the last agent run, as a dict
+        self.updated_at = None
+        self.last_score = None
+
+    def score(self, descriptors: dict) -> float:
+        """Largest distance of any plant from its reference (1.0 if the plant is new or missing)."""
+        if set(descriptors) != set(self.reference):
+            return 1.0
+        return max((descriptor_distance(d, self.reference[n]) for n, d in descriptors.items()), default=0.0)
+
+    def changed(self, descriptors: dict) -> bool:
+        if self.result is None or self.updated_at is None or time.time() - self.updated_at > self.max_age:
+            self.last_score = None
+            changed = True
+        else:
+            self.last_score = self.score(descriptors)
+            changed = self.last_score > self.threshold
+        logger.info(f"Change gate: score {self.last_score}, threshold {self.threshold}, "
+                    f"{'asking the agents' if changed else 'reusing the last requirements'}")
+        self.publish(changed)
+        return changed
+
+    def accept(self, descriptors: dict, result: dict):
+        """Make `descriptors` the new reference for `result`, the requirements just returned by the agents."""
+        self.reference = {n: np.asarray(d, dtype=np.float32) for n, d in descriptors.items()}
+        self.result = result
+        self.updated_at = time.time()
+
+    def publish(self, changed: bool = None):
+        status_store.set('change_gate', {
+            'score': self.last_score,
+            'threshold': self.threshold,
+            'invoked': changed,
+            'updated_at': self.updated_at,
+        })
+
+    def state(self) -> dict:
+        return {
+            'reference': {str(n): d.tolist() for n, d in self.reference.items()},
+            'result': self.result,
+            'updated_at': self.updated_at,
+        }
+
+    def restore(self, state: dict):
+        self.reference = {int(n): np.asarray(d, dtype=np.float32) for n, d in state.get('reference', {}).items()}
+        self.result = state.get('result')
+        self.updated_at = state.get('updated_at')
@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+from loguru import logger
+
+from .singleton import Singleton
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpointer(metaclass=Singleton):
+    """Saves registered pieces of runtime state to one JSON file and restores them at startup.
+
+    Each section is registered with a `save()` returning something JSON-serializable and
+    a `restore(value)` that applies it. The file is written to a temporary name and
+    renamed over the old one, so a crash mid-write leaves the previous checkpoint intact.
+    Saving is skipped when nothing changed since the last write.
+    """
+
+    def __init__(self, path: str = 'Data/checkpoint.json'):
+        self.path = path
+        self.sections = {}  # name -> (save, restore)
+        self._last_written = None
+        self.saved_at = None
+
+    def register(self, name: str, save, restore):
+        self.sections[name] = (save, restore)
+
+    def save(self) -> bool:
+        """Write the checkpoint. Returns False if it was unchanged (or a section failed)."""
+        try:
+            state = {name: save() for name, (save, _) in self.sections.items()}
+            body = json.dumps(state, sort_keys=True, default=str)
+        except Exception as e:
+            logger.error(f"Checkpoint not saved: {e}")
+            return False
+        if body == self._last_written:
+            return False
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'state': state}, default=str))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._last_written = body
+        self.saved_at = time.time()
+        logger.debug(f"Checkpoint saved to {self.path}")
+        return True
+
+    def restore(self) -> bool:
+        """Apply every registered section found in the checkpoint. Returns True if one was loaded."""
+        if not os.path.isfile(self.path):
+            return False
+        start = time.perf_counter()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return False
+        if checkpoint.get('version') != CHECKPOINT_VERSION:
+            logger.warning(f"Ignoring checkpoint version {checkpoint.get('version')}")
+            return False
+
+        state = checkpoint.get('state', {})
+        for name, (_, restore) in self.sections.items():
+            if name not in state:
+                continue
+            try:
+                restore(state[name])
+            except Exception as e:
+                logger.error(f"Failed to restore '{name}' from checkpoint: {e}")
+        self._last_written = json.dumps(state, sort_keys=True, default=str)
+        self.saved_at = checkpoint.get('saved_at')
+        age = time.time() - (self.saved_at or time.time())
+        logger.info(f"Restored checkpoint from {age / 60:.0f} min ago in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return True
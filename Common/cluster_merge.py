@@ -1,5 +1,4 @@
 import numpy as np
-from sklearn.cluster import DBSCAN
 
 def merge_clusters_across_positions(scan_data, eps=3.0, min_samples=1, camera_fov_x=3, camera_fov_y=2):
     """Merge detection boxes across different motor positions using DBSCAN"""
@@ -40,6 +39,8 @@ def merge_clusters_across_positions(scan_data, eps=3.0, min_samples=1, camera_fo
         return []
 
     features = np.array(box_features)
+    from sklearn.cluster import DBSCAN  # only needed once a scan finishes; keeps sklearn out of startup
+
     dbscan = DBSCAN(eps=eps, min_samples=min_samples)
     labels = dbscan.fit_predict(features)
 
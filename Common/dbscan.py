@@ -1,5 +1,4 @@
 import numpy as np
-from sklearn.cluster import DBSCAN
 
 def cluster_boxes_dbscan(boxes, eps=80, min_samples=2):
     if not boxes or len(boxes) < 2:
@@ -14,6 +13,8 @@ def cluster_boxes_dbscan(boxes, eps=80, min_samples=2):
         features.append([center_x, center_y, width, height])
 
     features = np.array(features)
+    from sklearn.cluster import DBSCAN  # deferred: sklearn adds about a second to startup
+
     dbscan = DBSCAN(eps=eps, min_samples=min_samples)
     cluster_labels = dbscan.fit_predict(features)
 
@@ -0,0 +1,198 @@
+import atexit
+import itertools
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from threading import Lock
+
+import numpy as np
+
+
+class FrameSlot:
+    """One preallocated frame buffer in a FrameBus pool.
+
+    A slot is reused only once nobody holds a reference to it. Everyone who keeps the
+    frame beyond the call that handed it over takes a reference with retain() and drops
+    it with release(). Using the slot as a context manager releases it on exit.
+    """
+
+    def __init__(self, pool: '_Pool', index: int):
+        self.pool = pool
+        self.index = index
+        self.offset = index * pool.frame_bytes
+        self.array = np.ndarray(pool.shape, dtype=pool.dtype, buffer=pool.shm.buf, offset=self.offset)
+        self.seq = 0
+        self.refs = 0
+
+    @property
+    def shm_name(self) -> str:
+        return self.pool.shm.name
+
+    def retain(self) -> 'FrameSlot':
+        with self.pool.lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        self.pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Pool:
+    """`count` frames of one shape/dtype in a single shared memory block."""
+
+    def __init__(self, shape, dtype, count: int, lock: Lock):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.lock = lock
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * count)
+        self.slots = [FrameSlot(self, i) for i in range(count)]
+        self.retired = False
+
+    def free_slot(self) -> FrameSlot | None:
+        for slot in self.slots:
+            if slot.refs == 0:
+                slot.refs = 1
+                return slot
+        return None
+
+    def release(self, slot: FrameSlot):
+        with self.lock:
+            slot.refs -= 1
+            if self.retired and not any(s.refs for s in self.slots):
+                self.close()
+
+    def close(self):
+        for slot in self.slots:
+            slot.array = None
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a stray view of a released slot is still alive; the mapping goes with it
+        self.shm.unlink()
+
+
+class FrameBus:
+    """Fixed pool of shared-memory frame buffers with reference-counted slots.
+
+    A producer takes a free slot with acquire_write(), fills it in place and commit()s
+    it as the latest frame. Consumers take the latest slot with acquire_latest() and
+    release it when done, so nothing is allocated or copied per frame, and an inference
+    worker can attach to the same memory by name. When every slot is busy, the new
+    frame is dropped (counted in `overruns`) rather than growing the pool. A change of
+    frame shape allocates a new pool; the old one is freed once its last slot is released.
+    """
+
+    def __init__(self, name: str, slots: int = 4):
+        self.name = name
+        self.count = slots
+        self.lock = Lock()
+        self._pool = None
+        self._latest = None
+        self._seq = itertools.count(1)
+        self.seq = 0
+        self.overruns = 0
+        atexit.register(self.close)
+
+    def acquire_write(self, shape, dtype=np.uint8) -> FrameSlot | None:
+        """A free slot for a frame of `shape`, referenced once by the caller, or None if all are busy."""
+        with self.lock:
+            pool = self._pool
+            if pool is None or pool.shape != tuple(shape) or pool.dtype != np.dtype(dtype):
+                pool = self._replace_pool(shape, dtype)
+            slot = pool.free_slot()
+            if slot is None:
+                self.overruns += 1
+            return slot
+
+    def commit(self, slot: FrameSlot):
+        """Make `slot` the latest frame. The bus keeps its own reference until the next commit."""
+        with self.lock:
+            slot.refs += 1
+            slot.seq = self.seq = next(self._seq)
+            previous, self._latest = self._latest, slot
+        if previous is not None:
+            previous.release()
+
+    def acquire_latest(self) -> FrameSlot | None:
+        """The newest committed slot with a reference held for the caller, or None."""
+        with self.lock:
+            slot = self._latest
+            if slot is not None:
+                slot.refs += 1
+            return slot
+
+    def publish(self, frame: np.ndarray):
+        """Copy `frame` into a slot and commit it, for producers that do not own a slot yet."""
+        slot = self.acquire_write(frame.shape, frame.dtype)
+        if slot is None:
+            return
+        np.copyto(slot.array, frame)
+        self.commit(slot)
+        slot.release()
+
+    @contextmanager
+    def write(self, shape, dtype=np.uint8):
+        """Yield an array of `shape` to draw into; it is committed as the latest frame on exit.
+        When every slot is busy a scratch array is yielded instead and the frame is dropped."""
+        slot = self.acquire_write(shape, dtype)
+        if slot is None:
+            yield np.empty(shape, dtype=dtype)
+            return
+        try:
+            yield slot.array
+            self.commit(slot)
+        finally:
+            slot.release()
+
+    def _replace_pool(self, shape, dtype) -> '_Pool':
+        old = self._pool
+        self._pool = _Pool(shape, dtype, self.count, self.lock)
+        if old is not None:
+            old.retired = True
+            if self._latest is not None and self._latest.pool is old:
+                old.slots[self._latest.index].refs -= 1
+                self._latest = None
+            if not any(s.refs for s in old.slots):
+                old.close()
+        return self._pool
+
+    def stats(self):
+        pool = self._pool
+        return {
+            'slots': self.count,
+            'in_use': sum(1 for s in pool.slots if s.refs) if pool else 0,
+            'shape': list(pool.shape) if pool else None,
+            'overruns': self.overruns,
+        }
+
+    @property
+    def format(self):
+        """(shape, dtype) of the current pool, or None before the first frame."""
+        pool = self._pool
+        return (pool.shape, pool.dtype) if pool else None
+
+    def close(self):
+        """Free the shared memory at shutdown, whether or not slots are still referenced."""
+        with self.lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+                self._latest = None
+
+
+def attach(shm_name: str, offset: int, shape, dtype, cache: dict, limit: int = 4) -> np.ndarray:
+    """View of a slot from another process. `cache` keeps up to `limit` attached segments by name."""
+    shm = cache.get(shm_name)
+    if shm is None:
+        while len(cache) >= limit:
+            cache.pop(next(iter(cache))).close()
+        # The creating process owns and unlinks the segment; do not register it here
+        shm = cache[shm_name] = shared_memory.SharedMemory(name=shm_name, track=False)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
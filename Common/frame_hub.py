@@ -0,0 +1,222 @@
+import itertools
+import time
+from threading import Lock
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from .frame_bus import FrameBus, FrameSlot
+
+# Widths a client may ask for; requests are rounded down to one of these so the
+# number of distinct renditions (and encodes per frame) stays small. 0 is full size.
+WIDTH_LADDER = (160, 320, 480, 640, 960, 1280)
+QUALITY_STEP = 10
+DEFAULT_QUALITY = 80
+
+
+class Rendition(NamedTuple):
+    width: int = 0  # 0 keeps the source resolution
+    quality: int = DEFAULT_QUALITY
+
+    @classmethod
+    def from_request(cls, width=None, quality=None) -> 'Rendition':
+        """Snap requested width/quality to the ladder."""
+        width = int(width or 0)
+        if width > 0:
+            width = max([w for w in WIDTH_LADDER if w <= width], default=WIDTH_LADDER[0])
+        quality = DEFAULT_QUALITY if quality is None else int(quality)
+        quality = min(95, max(QUALITY_STEP, round(quality / QUALITY_STEP) * QUALITY_STEP))
+        return cls(width, quality)
+
+    def encode(self, frame) -> bytes:
+        if self.width and frame.shape[1] > self.width:
+            height = round(frame.shape[0] * self.width / frame.shape[1])
+            frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes()
+
+
+class StreamClient:
+    """Delivery counters for one stream consumer."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, remote: str = None, rendition: Rendition = Rendition(), max_fps: float = 0):
+        self.id = next(self._ids)
+        self.remote = remote
+        self.rendition = rendition
+        self.max_fps = max_fps
+        self.connected_at = time.time()
+        self.last_seq = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'remote': self.remote,
+            'width': self.rendition.width,
+            'quality': self.rendition.quality,
+            'max_fps': self.max_fps,
+            'connected_for': round(time.time() - self.connected_at, 1),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+
+class FrameHub:
+    """Latest frame of a stream, shared by every consumer.
+
+    Frames live in a FrameBus: the producer fills a free slot in place and commits it
+    with a new sequence number. Consumers only ever take the newest frame when they are
+    ready for one, so a slow client skips frames (counted as dropped) instead of
+    queueing them or holding back anyone else. Each rendition of a frame is encoded once
+    and shared by all consumers asking for it.
+    """
+
+    def __init__(self, name: str, slots: int = 4):
+        self.name = name
+        self.bus = FrameBus(name, slots)
+        self._lock = Lock()
+        self._capture_lock = Lock()
+        self._encode_lock = Lock()
+        self._encoded = {}  # rendition -> (seq, bytes)
+        self.encodes = 0
+        self.clients = {}
+
+    @property
+    def seq(self) -> int:
+        return self.bus.seq
+
+    def publish(self, frame):
+        """Copy `frame` in as the latest frame."""
+        if frame is None:
+            return
+        self.bus.publish(frame)
+
+    def write(self, shape, dtype='uint8'):
+        """Context manager yielding a buffer to draw the next frame into, e.g. annotate(..., out=buffer)."""
+        return self.bus.write(shape, dtype)
+
+    def capture(self, camera) -> FrameSlot | None:
+        """Read one frame from `camera` straight into a slot and publish it.
+
+        Returns the slot with a reference held for the caller (release it, or use it in
+        a with block), or None if the read failed. When every slot is held the camera is
+        not read at all (one overrun) and None is returned too. Reads are serialized,
+        since the dashboard pump and the jobs share one VideoCapture.
+        """
+        with self._capture_lock:
+            return self._capture(camera)[0]
+
+    def read(self, camera) -> np.ndarray | None:
+        """Like camera.read() but through capture(): returns a copy of the frame the caller
+        may keep, or None if the read failed. If every slot is held the frame is read into
+        a private array instead and not published."""
+        with self._capture_lock:
+            slot, held = self._capture(camera)
+            if held:
+                ret, frame = camera.read()
+                return frame if ret else None
+        if slot is None:
+            return None
+        with slot:
+            return slot.array.copy()
+
+    def _capture(self, camera) -> tuple[FrameSlot | None, bool]:
+        """capture() without the lock: (slot or None, whether every slot was held)."""
+        if self.bus.format:
+            slot = self.bus.acquire_write(*self.bus.format)
+            if slot is None:
+                return None, True
+            ret, frame = camera.read(slot.array)
+            if not ret:
+                slot.release()
+                return None, False
+            if frame is not slot.array:
+                # The camera changed resolution and cv2 allocated a new array; the new
+                # shape gets a fresh pool, so a slot is free
+                slot.release()
+                slot = self.bus.acquire_write(frame.shape, frame.dtype)
+                np.copyto(slot.array, frame)
+        else:
+            ret, frame = camera.read()
+            if not ret:
+                return None, False
+            slot = self.bus.acquire_write(frame.shape, frame.dtype)
+            np.copyto(slot.array, frame)
+        self.bus.commit(slot)
+        return slot, False
+
+    def jpeg(self, rendition: Rendition = Rendition()):
+        """Return (seq, bytes) of the newest frame in `rendition`, encoding it at most once."""
+        seq = self.bus.seq
+        cached = self._encoded.get(rendition, (0, None))
+        if not seq or cached[0] == seq:
+            return cached
+        with self._encode_lock:
+            cached = self._encoded.get(rendition, (0, None))
+            if cached[0] != self.bus.seq:
+                slot = self.bus.acquire_latest()
+                if slot is None:
+                    return cached
+                with slot:
+                    cached = (slot.seq, rendition.encode(slot.array))
+                self._encoded[rendition] = cached
+                self.encodes += 1
+            return cached
+
+    def subscribe(self, remote: str = None, rendition: Rendition = Rendition(), max_fps: float = 0) -> StreamClient:
+        client = StreamClient(remote, rendition, max_fps)
+        with self._lock:
+            self.clients[client.id] = client
+        return client
+
+    def unsubscribe(self, client: StreamClient):
+        with self._lock:
+            self.clients.pop(client.id, None)
+            in_use = {c.rendition for c in self.clients.values()}
+        with self._encode_lock:
+            for rendition in set(self._encoded) - in_use:
+                del self._encoded[rendition]
+
+    def stream(self, remote: str = None, rendition: Rendition = Rendition(), max_fps: float = 0,
+               sleep=time.sleep, poll_interval: float = 0.01):
+        """Yield the JPEG bytes of each new frame as the consumer becomes ready for it,
+        at most `max_fps` times a second (0 for no cap)."""
+        client = self.subscribe(remote, rendition, max_fps)
+        min_interval = 1 / max_fps if max_fps > 0 else 0
+        next_due = 0.0
+        try:
+            while True:
+                wait = next_due - time.monotonic()
+                if wait > 0:
+                    sleep(wait)
+                seq, data = self.jpeg(rendition)
+                if seq <= client.last_seq or data is None:
+                    sleep(poll_interval)
+                    continue
+                if client.last_seq:
+                    client.dropped += seq - client.last_seq - 1
+                client.last_seq = seq
+                client.delivered += 1
+                next_due = time.monotonic() + min_interval
+                yield data
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self._lock:
+            clients = list(self.clients.values())
+        return {
+            'seq': self.seq,
+            'encodes': self.encodes,
+            'renditions': len(self._encoded),
+            'buffers': self.bus.stats(),
+            'clients': [client.as_dict() for client in clients],
+        }
+
+
+camera_hub = FrameHub('camera')
+yolo_hub = FrameHub('yolo')
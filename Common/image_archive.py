@@ -0,0 +1,149 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import cv2
+from loguru import logger
+
+from .singleton import Singleton
+
+_FORMATS = {
+    'jpg': lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+    'webp': lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    'png': lambda quality: [cv2.IMWRITE_PNG_COMPRESSION, 3],
+}
+
+
+class ImageArchive(metaclass=Singleton):
+    """Writes plant photos on a background thread and keeps an index of them.
+
+    submit() only queues the frame, so the motion loop never waits on disk; when the
+    writer falls `queue_size` frames behind, further frames are dropped (counted in
+    `dropped`). The writer saves the image in the configured format, makes its thumbnail
+    once, and appends an entry (id, plant id, position, time, paths) to
+    `root/index.jsonl`. The newest `keep` entries are also kept in memory, so the
+    dashboard can page through recent history without listing directories; older pages
+    are read from the index file.
+    """
+
+    def __init__(self, root: str = 'Images', fmt: str = 'jpg', quality: int = 90, thumb_width: int = 160,
+                 queue_size: int = 32, keep: int = 1000):
+        if fmt not in _FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        self.root = root
+        self.fmt = fmt
+        self.quality = quality
+        self.thumb_width = thumb_width
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.entries = deque(maxlen=keep)  # newest entries of the index
+        self.total = 0
+        self.per_plant = Counter()  # plant id -> number of entries
+        self.dropped = 0
+        last_id = 0
+        for entry in self._read_index():
+            self.entries.append(entry)
+            self.total += 1
+            self.per_plant[entry['plant_id']] += 1
+            last_id = entry['id']
+        self._ids = itertools.count(last_id + 1)
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def _read_index(self):
+        """Entries of index.jsonl, oldest first."""
+        if not os.path.isfile(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt line in {self.index_path}")
+
+    def submit(self, frame, session: str, name: str, plant_id: int = None, position=None) -> int | None:
+        """Queue `frame` to be saved as `root/session/name.<fmt>`. The archive takes ownership
+        of the array, so pass a copy if it will be modified. Returns the entry id, or None
+        if the queue was full and the frame was dropped."""
+        entry_id = next(self._ids)
+        try:
+            self._queue.put_nowait((entry_id, frame, session, name, plant_id, position, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Image archive queue full, dropped {session}/{name} ({self.dropped} dropped so far)")
+            return None
+        return entry_id
+
+    def flush(self):
+        """Block until every queued frame has been written."""
+        self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.error(f"Failed to archive image {item[3]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, entry_id, frame, session, name, plant_id, position, timestamp):
+        session_dir = os.path.join(self.root, session)
+        os.makedirs(os.path.join(session_dir, 'thumbs'), exist_ok=True)
+        path = os.path.join(session_dir, f"{name}.{self.fmt}")
+        if not cv2.imwrite(path, frame, _FORMATS[self.fmt](self.quality)):
+            raise IOError(f"cv2.imwrite failed for {path}")
+
+        height, width = frame.shape[:2]
+        thumb_height = max(1, round(height * self.thumb_width / width))
+        thumb = cv2.resize(frame, (self.thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        thumb_path = os.path.join(session_dir, 'thumbs', f"{name}.jpg")
+        cv2.imwrite(thumb_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 75])
+
+        entry = {
+            'id': entry_id,
+            'plant_id': plant_id,
+            'x': None if position is None else position[0],
+            'y': None if position is None else position[1],
+            'time': timestamp,
+            'session': session,
+            'path': path,
+            'thumb': thumb_path,
+            'width': width,
+            'height': height,
+        }
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            self.entries.append(entry)
+            self.total += 1
+            self.per_plant[plant_id] += 1
+
+    def get(self, entry_id: int) -> dict | None:
+        with self._lock:
+            for entry in reversed(self.entries):
+                if entry['id'] == entry_id:
+                    return entry
+            if self.entries and entry_id > self.entries[0]['id']:
+                return None
+            return next((entry for entry in self._read_index() if entry['id'] == entry_id), None)
+
+    def page(self, offset: int = 0, limit: int = 50, plant_id: int = None) -> tuple[int, list[dict]]:
+        """Newest-first page of the index, optionally for one plant. Returns (total, entries)."""
+        with self._lock:
+            total = self.total if plant_id is None else self.per_plant[plant_id]
+            end = total - offset
+            if end <= 0:
+                return total, []
+            start = max(0, end - limit)
+            entries = [e for e in self.entries if plant_id is None or e['plant_id'] == plant_id]
+            if len(entries) < total - start:
+                # Older than the entries kept in memory
+                entries = [e for e in self._read_index() if plant_id is None or e['plant_id'] == plant_id]
+            cut = len(entries) - total  # entries[cut + i] is the i-th entry overall
+            return total, list(reversed(entries[cut + start:cut + end]))
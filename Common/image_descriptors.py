@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+DESCRIPTOR_WIDTH = 64  # crops are shrunk to this width before describing them
+HIST_BINS = (16, 8)  # hue, saturation
+
+
+def _crop(frame: np.ndarray, box=None) -> np.ndarray:
+    if box is None:
+        return frame
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+    x2, y2 = min(width, int(box[2])), min(height, int(box[3]))
+    return frame[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else frame
+
+
+def _shrink(image: np.ndarray, width: int) -> np.ndarray:
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def color_descriptor(frame: np.ndarray, box=None) -> np.ndarray:
+    """Normalized hue/saturation histogram of the plant in `box`, as a flat float32 vector."""
+    hsv = cv2.cvtColor(_shrink(_crop(frame, box), DESCRIPTOR_WIDTH), cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(HIST_BINS), [0, 180, 0, 256])
+    cv2.normalize(hist, hist, 1, 0, cv2.NORM_L1)
+    return hist.ravel()
+
+
+def descriptor_distance(a, b) -> float:
+    """Bhattacharyya distance of two color descriptors: 0 for identical, 1 for disjoint."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    if a.shape != b.shape:
+        return 1.0
+    return float(cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA))
+
+
+def phash(image: np.ndarray) -> int:
+    """64-bit perceptual hash: signs of the 8x8 lowest DCT frequencies of the 32x32 grayscale image."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    bits = low[1:] > np.median(low[1:])  # the DC term only carries brightness
+    return int(np.packbits(np.concatenate([[False], bits])).view('>u8')[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
@@ -0,0 +1,291 @@
+import itertools
+import queue
+import threading
+import time
+import traceback
+
+from loguru import logger
+
+from .resource_arbiter import PRIORITY_SCAN, RESOURCES, ResourceArbiter
+from .singleton import Singleton
+from .state_store import status_store
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled."""
+
+
+class JobPreempted(JobCancelled):
+    """Raised inside a job that has to give up the gantry to higher-priority work.
+    The runner puts the job back in the queue."""
+
+
+class CancellationToken:
+    """Cancellation flag for one job. Waits on it wake up as soon as it is cancelled."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.preempted = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def preempt(self):
+        self.preempted = True
+        self._event.set()
+
+    def _raise(self):
+        raise JobPreempted() if self.preempted else JobCancelled()
+
+    def check(self):
+        if self._event.is_set():
+            self._raise()
+
+    def sleep(self, seconds: float):
+        """Sleep for `seconds`, raising JobCancelled immediately if cancelled meanwhile."""
+        if self._event.wait(seconds):
+            self._raise()
+
+
+_current = threading.local()
+_NEVER_CANCELLED = CancellationToken()
+
+
+def current_job():
+    """The Job running on this thread, or None outside the runner."""
+    return getattr(_current, 'job', None)
+
+
+def current_token() -> CancellationToken:
+    job = current_job()
+    return job.token if job else _NEVER_CANCELLED
+
+
+def job_sleep(seconds: float):
+    """Drop-in for time.sleep inside jobs that returns early (by raising) on cancel."""
+    current_token().sleep(seconds)
+
+
+def check_cancelled():
+    """Safe point inside a job: raises JobCancelled if the job was cancelled."""
+    current_token().check()
+
+
+def report_progress(progress: float, message: str = None):
+    """Report progress (0..1) of the job running on this thread."""
+    job = current_job()
+    if job is None:
+        return
+    job.progress = max(0.0, min(1.0, progress))
+    if message is not None:
+        job.message = message
+    JobRunner().publish()
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, func, priority: int = PRIORITY_SCAN, resources=RESOURCES):
+        self.id = f"{next(self._ids)}-{name}"
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.resources = tuple(resources)
+        self.token = CancellationToken()
+        self.preemptions = 0
+        self.status = 'queued'  # queued, waiting (for resources), running, succeeded, failed, cancelled
+        self.progress = 0.0
+        self.message = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'priority': self.priority,
+            'preemptions': self.preemptions,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobRunner(metaclass=Singleton):
+    """Runs submitted jobs one at a time on a worker thread, most urgent first.
+
+    Jobs are registered by name as zero-argument callables with a priority (see
+    resource_arbiter; lower runs first) and the resources they need. Before running, a
+    job takes its resources from the ResourceArbiter. Job code uses job_sleep() and
+    check_cancelled() so cancel requests take effect at the next wait or safe point
+    rather than after the current sleep runs out. A job preempted there by more urgent
+    work (a manual motor command, or a higher-priority job) is queued again and rerun
+    from the start.
+    """
+
+    def __init__(self, history: int = 20):
+        self.registry = {}  # name -> (func, priority, resources)
+        self.covers = {}  # name -> names of jobs whose work a successful run of it also does
+        self.default_job = None
+        self.jobs = {}  # id -> Job, most recent `history` finished jobs plus all pending ones
+        self.history = history
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self.current = None
+        self.last_success = {}  # name -> time.time() of the last successful run
+        self.arbiter = ResourceArbiter()
+        threading.Thread(target=self._run, daemon=True).start()
+        self.publish()
+
+    def register(self, name: str, func, default: bool = False, priority: int = PRIORITY_SCAN, resources=RESOURCES,
+                 covers=()):
+        """Register job `name`. A successful run also counts as a run of each job in `covers`
+        for submit_if_due(), so a periodic job is not repeated right after a job that did its work."""
+        self.registry[name] = (func, priority, resources)
+        self.covers[name] = tuple(covers)
+        if default or self.default_job is None:
+            self.default_job = name
+
+    def submit(self, name: str = None, coalesce: bool = True) -> Job:
+        """Queue a run of job `name` (the default job if None). With `coalesce`, a run of
+        the same job that is already queued is returned instead of queueing another."""
+        name = name or self.default_job
+        if name not in self.registry:
+            raise KeyError(f"Unknown job: {name}")
+        if coalesce:
+            with self._lock:
+                pending = [job for job in self.jobs.values() if job.name == name and job.status == 'queued']
+            if pending:
+                logger.info(f"Job {pending[0].id} already queued")
+                return pending[0]
+        func, priority, resources = self.registry[name]
+        job = Job(name, func, priority, resources)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._enqueue(job)
+        logger.info(f"Job {job.id} queued")
+        with self._lock:
+            active = [other for other in self.jobs.values() if other.status in ('waiting', 'running')]
+        for other in active:
+            if job.priority < other.priority:
+                logger.info(f"Job {job.id} preempts {other.id}")
+                other.token.preempt()
+        self.publish()
+        return job
+
+    def submit_if_due(self, name: str, interval: float) -> Job | None:
+        """Submit `name` unless it last succeeded less than `interval` seconds ago.
+        Run from a short periodic tick, this keeps a long schedule across restarts."""
+        if time.time() - self.last_success.get(name, 0) < interval:
+            return None
+        return self.submit(name)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.token.cancel()
+        if job.status in ('queued', 'waiting'):
+            self._finish(job, 'cancelled')
+        logger.info(f"Job {job.id} cancel requested")
+        return True
+
+    def cancel_all(self) -> int:
+        return sum(self.cancel(job_id) for job_id in list(self.jobs))
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list[Job]:
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda job: job.submitted_at)
+
+    def publish(self):
+        """Push job list and overall status to the dashboard state store."""
+        jobs = self.list_jobs()
+        status_store.update(
+            jobs=[job.as_dict() for job in jobs],
+            job_status='running' if self.current else 'stopped',
+        )
+
+    def _enqueue(self, job: Job):
+        self._queue.put((job.priority, next(self._order), job))
+
+    def _finish(self, job: Job, status: str, error: str = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        with self._lock:
+            finished = [j for j in self.jobs.values() if j.finished]
+            for old in sorted(finished, key=lambda j: j.finished_at)[:-self.history]:
+                del self.jobs[old.id]
+        self.publish()
+
+    def _requeue(self, job: Job):
+        job.preemptions += 1
+        job.token = CancellationToken()
+        job.status = 'queued'
+        job.progress = 0.0
+        job.message = 'Preempted, waiting to run again'
+        self._enqueue(job)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()[-1]
+            if job.finished:
+                continue
+            job.status = 'waiting'
+            self.publish()
+            lease = self.arbiter.acquire(job.name, job.resources, job.priority, on_preempt=job.token.preempt,
+                                         should_abort=lambda: job.token.cancelled)
+            if lease is None:
+                if job.token.preempted:
+                    self._requeue(job)
+                elif not job.finished:
+                    self._finish(job, 'cancelled')
+                continue
+
+            self.current = job
+            _current.job = job
+            job.status = 'running'
+            job.started_at = time.time()
+            self.publish()
+            logger.info(f"Job {job.id} started")
+            try:
+                job.func()
+            except JobPreempted:
+                logger.info(f"Job {job.id} preempted, requeued")
+                self._requeue(job)
+            except JobCancelled:
+                logger.info(f"Job {job.id} cancelled")
+                self._finish(job, 'cancelled')
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}\n{traceback.format_exc()}")
+                self._finish(job, 'failed', str(e))
+            else:
+                job.progress = 1.0
+                finished_at = time.time()
+                for name in (job.name, *self.covers.get(job.name, ())):
+                    self.last_success[name] = finished_at
+                logger.info(f"Job {job.id} completed")
+                self._finish(job, 'succeeded')
+            finally:
+                self.arbiter.release(lease)
+                _current.job = None
+                self.current = None
+                self.publish()
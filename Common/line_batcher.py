@@ -0,0 +1,31 @@
+from collections import deque
+from threading import Lock
+
+
+class LineBatcher:
+    """Bounded backlog of text lines, drained in batches by a consumer.
+
+    When producers outrun the consumer the oldest lines are dropped and counted, so
+    pushing never blocks.
+    """
+
+    def __init__(self, maxlen: int = 500):
+        self._lines = deque(maxlen=maxlen)
+        self._lock = Lock()
+        self.dropped = 0  # total lines dropped since start
+        self._dropped_unreported = 0
+
+    def push(self, line: str):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self.dropped += 1
+                self._dropped_unreported += 1
+            self._lines.append(line)
+
+    def drain(self) -> tuple[list[str], int]:
+        """Return the buffered lines and how many were dropped since the last drain."""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self._dropped_unreported = self._dropped_unreported, 0
+        return lines, dropped
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .singleton import Singleton
+from .state_store import status_store
+
+# One fixed-size record per capture; a plant's series is a flat file of these
+RECORD = np.dtype([
+    ('timestamp', np.float64),
+    ('canopy_area', np.float32),  # green pixels inside the plant box
+    ('green_ratio', np.float32),  # canopy_area / box area
+    ('bbox_w', np.float32),
+    ('bbox_h', np.float32),
+    ('bbox_area', np.float32),
+])
+
+# HSV range counted as foliage
+GREEN_LOW = np.array([35, 40, 40], dtype=np.uint8)
+GREEN_HIGH = np.array([85, 255, 255], dtype=np.uint8)
+
+TREND_POINTS = 8  # captures used for the growth trends
+
+
+def growth_metrics(frame: np.ndarray, box=None) -> dict:
+    """Canopy area and green ratio of `frame` inside `box` (x1, y1, x2, y2; whole frame if None)."""
+    height, width = frame.shape[:2]
+    if box is None:
+        x1, y1, x2, y2 = 0, 0, width, height
+    else:
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(width, int(box[2])), min(height, int(box[3]))
+    crop = frame[y1:y2, x1:x2]
+    if crop.size == 0:
+        return {'canopy_area': 0.0, 'green_ratio': 0.0, 'bbox_w': 0.0, 'bbox_h': 0.0, 'bbox_area': 0.0}
+    mask = cv2.inRange(cv2.cvtColor(crop, cv2.COLOR_BGR2HSV), GREEN_LOW, GREEN_HIGH)
+    canopy = cv2.countNonZero(mask)
+    area = (x2 - x1) * (y2 - y1)
+    return {
+        'canopy_area': float(canopy),
+        'green_ratio': canopy / area,
+        'bbox_w': float(x2 - x1),
+        'bbox_h': float(y2 - y1),
+        'bbox_area': float(area),
+    }
+
+
+def trend_per_day(timestamps: np.ndarray, values: np.ndarray) -> float | None:
+    """Least-squares slope of `values` in units per day, or None with fewer than two points."""
+    if len(values) < 2 or np.ptp(timestamps) == 0:
+        return None
+    days = (timestamps - timestamps[0]) / 86400
+    return float(np.polyfit(days, values, 1)[0])
+
+
+class PlantHistory(metaclass=Singleton):
+    """Per-plant timelapse of growth metrics.
+
+    Each capture appends one RECORD to `root/plant_<id>.bin`, so history grows without
+    rewriting or re-reading old images, and a series is read back with one np.fromfile.
+    The latest values and trends of every plant are published as 'plant_growth'.
+    """
+
+    def __init__(self, root: str = 'Data/plant_history'):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.summary = {}
+        for name in os.listdir(root):
+            if name.startswith('plant_') and name.endswith('.bin'):
+                plant_id = int(name[len('plant_'):-len('.bin')])
+                self.summary[plant_id] = self._summarize(self.series(plant_id))
+        self.publish()
+
+    def _path(self, plant_id: int) -> str:
+        return os.path.join(self.root, f"plant_{plant_id}.bin")
+
+    def record(self, plant_id: int, frame: np.ndarray, box=None, timestamp: float = None) -> dict:
+        """Compute the metrics of a new capture of `plant_id` and append them to its series."""
+        metrics = growth_metrics(frame, box)
+        row = np.zeros(1, dtype=RECORD)
+        row['timestamp'] = time.time() if timestamp is None else timestamp
+        for name, value in metrics.items():
+            row[name] = value
+        with self._lock:
+            with open(self._path(plant_id), 'ab') as f:
+                row.tofile(f)
+            self.summary[plant_id] = self._summarize(self.series(plant_id, last=TREND_POINTS))
+        self.publish()
+        return metrics
+
+    def series(self, plant_id: int, last: int = None) -> np.ndarray:
+        """The plant's records in capture order (optionally only the `last` N)."""
+        path = self._path(plant_id)
+        if not os.path.isfile(path):
+            return np.zeros(0, dtype=RECORD)
+        if last is None:
+            return np.fromfile(path, dtype=RECORD)
+        count = os.path.getsize(path) // RECORD.itemsize
+        offset = max(0, count - last) * RECORD.itemsize
+        return np.fromfile(path, dtype=RECORD, offset=offset)
+
+    @staticmethod
+    def _summarize(series: np.ndarray) -> dict:
+        if not len(series):
+            return {}
+        recent = series[-TREND_POINTS:]
+        latest = series[-1]
+        return {
+            'captured_at': float(latest['timestamp']),
+            'canopy_area': float(latest['canopy_area']),
+            'green_ratio': float(latest['green_ratio']),
+            'bbox_area': float(latest['bbox_area']),
+            'canopy_trend': trend_per_day(recent['timestamp'], recent['canopy_area']),
+            'bbox_trend': trend_per_day(recent['timestamp'], recent['bbox_area']),
+        }
+
+    def publish(self):
+        status_store.set('plant_growth', {str(plant_id): summary for plant_id, summary in self.summary.items()})
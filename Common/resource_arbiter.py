@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import time
+from collections import deque
+from threading import Condition
+
+from .singleton import Singleton
+from .state_store import status_store
+
+# Lower runs first. Manual control from the dashboard beats picking, picking beats scans.
+PRIORITY_MANUAL = 0
+PRIORITY_PICK = 10
+PRIORITY_SCAN = 20
+
+RESOURCES = ('gantry', 'camera')
+
+
+class Lease:
+    """Ownership of a set of resources, optionally expiring at `expires_at`."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, owner: str, resources, priority: int, on_preempt=None):
+        self.id = next(self._ids)
+        self.owner = owner
+        self.resources = frozenset(resources)
+        self.priority = priority
+        self.on_preempt = on_preempt
+        self.granted_at = None
+        self.expires_at = None
+        self.preempted = False
+
+    def expired(self, now: float = None) -> bool:
+        return self.expires_at is not None and (now or time.monotonic()) >= self.expires_at
+
+    def as_dict(self):
+        return {
+            'owner': self.owner,
+            'resources': sorted(self.resources),
+            'priority': self.priority,
+            'expires_in': None if self.expires_at is None else round(max(0.0, self.expires_at - time.monotonic()), 1),
+        }
+
+
+class ResourceArbiter(metaclass=Singleton):
+    """Grants exclusive use of the gantry and camera by priority.
+
+    A request is granted once none of its resources are held and no waiting request of
+    higher priority wants any of them. A request that outranks a current holder calls
+    that lease's `on_preempt`, so a running job can give the gantry up at its next safe
+    point. Leases may carry an expiry (manual control holds the gantry for a while after
+    the last command). Busy intervals are kept per resource to report utilization.
+    """
+
+    def __init__(self, resources=RESOURCES, history: float = 24 * 3600):
+        self.resources = tuple(resources)
+        self.history = history
+        self._cond = Condition()
+        self._holders = {}  # resource -> Lease
+        self._waiting = []  # heap of (priority, seq, lease)
+        self._seq = itertools.count()
+        self._busy = {name: deque() for name in self.resources}  # resource -> (start, end, owner)
+        self.started_at = time.monotonic()
+
+    def acquire(self, owner: str, resources=('gantry',), priority: int = PRIORITY_SCAN, timeout: float = None,
+                on_preempt=None, hold: float = None, should_abort=None) -> Lease | None:
+        """Block until `resources` are granted. Returns the lease, or None on timeout or
+        when `should_abort()` turns true while waiting. `hold` makes the lease expire that
+        many seconds after it is granted."""
+        lease = Lease(owner, resources, priority, on_preempt)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = (priority, next(self._seq), lease)
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self._preempt_for(lease)
+            try:
+                while not self._grantable(lease):
+                    if should_abort is not None and should_abort():
+                        return None
+                    wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+                    if wait <= 0:
+                        return None
+                    self._cond.wait(min(wait, self._next_expiry() or wait))
+                now = time.monotonic()
+                lease.granted_at = now
+                lease.expires_at = None if hold is None else now + hold
+                for name in lease.resources:
+                    self._holders[name] = lease
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        self.publish()
+        return lease
+
+    def renew(self, lease: Lease, hold: float) -> bool:
+        """Push back the expiry of a lease that is still held."""
+        with self._cond:
+            if not self._holds(lease):
+                return False
+            lease.expires_at = time.monotonic() + hold
+            return True
+
+    def holder(self, resource: str = 'gantry') -> Lease | None:
+        with self._cond:
+            self._reap()
+            return self._holders.get(resource)
+
+    def release(self, lease: Lease):
+        with self._cond:
+            if self._holds(lease):
+                self._drop(lease, time.monotonic())
+            self._cond.notify_all()
+        self.publish()
+
+    def utilization(self, window: float = 3600) -> dict:
+        """Fraction of the last `window` seconds each resource was held, overall and per owner."""
+        now = time.monotonic()
+        start = max(now - window, self.started_at)
+        span = max(now - start, 1e-9)
+        report = {}
+        with self._cond:
+            self._reap()
+            for name in self.resources:
+                intervals = list(self._busy[name])
+                lease = self._holders.get(name)
+                if lease is not None:
+                    intervals.append((lease.granted_at, now, lease.owner))
+                by_owner = {}
+                for begin, end, owner in intervals:
+                    overlap = min(end, now) - max(begin, start)
+                    if overlap > 0:
+                        by_owner[owner] = by_owner.get(owner, 0.0) + overlap
+                report[name] = {
+                    'busy': round(sum(by_owner.values()) / span, 4),
+                    'by_owner': {owner: round(seconds / span, 4) for owner, seconds in by_owner.items()},
+                }
+        return {'window': round(span, 1), 'resources': report}
+
+    def stats(self, window: float = 3600) -> dict:
+        with self._cond:
+            self._reap()
+            holders = {name: lease.as_dict() for name, lease in self._holders.items()}
+            waiting = [lease.as_dict() for _, _, lease in sorted(self._waiting)]
+        return {'holders': holders, 'waiting': waiting, 'utilization': self.utilization(window)}
+
+    def publish(self):
+        """Push current holders to the dashboard state store."""
+        with self._cond:
+            self._reap()
+            holders = {name: lease.owner for name, lease in self._holders.items()}
+        status_store.set('resources', holders)
+
+    def _holds(self, lease: Lease) -> bool:
+        return all(self._holders.get(name) is lease for name in lease.resources)
+
+    def _drop(self, lease: Lease, end: float):
+        for name in lease.resources:
+            if self._holders.get(name) is lease:
+                del self._holders[name]
+                busy = self._busy[name]
+                busy.append((lease.granted_at, end, lease.owner))
+                while busy and busy[0][1] < end - self.history:
+                    busy.popleft()
+
+    def _reap(self):
+        """Release leases whose hold has run out."""
+        now = time.monotonic()
+        for lease in {lease for lease in self._holders.values() if lease.expired(now)}:
+            self._drop(lease, lease.expires_at)
+
+    def _next_expiry(self) -> float | None:
+        expiries = [lease.expires_at for lease in self._holders.values() if lease.expires_at is not None]
+        return max(0.01, min(expiries) - time.monotonic()) if expiries else None
+
+    def _grantable(self, lease: Lease) -> bool:
+        self._reap()
+        if any(name in self._holders for name in lease.resources):
+            return False
+        for _, _, other in sorted(self._waiting):
+            if other is lease:
+                return True
+            if other.resources & lease.resources:
+                return False
+        return True
+
+    def _preempt_for(self, lease: Lease):
+        for holder in {self._holders[name] for name in lease.resources if name in self._holders}:
+            if holder.priority > lease.priority and not holder.preempted and holder.on_preempt is not None:
+                holder.preempted = True
+                holder.on_preempt()
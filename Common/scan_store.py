@@ -0,0 +1,256 @@
+import os
+import shutil
+import time
+
+import numpy as np
+from loguru import logger
+
+from .singleton import Singleton
+
+# One .npy file per column, so a query only maps the columns it touches
+DETECTION_COLUMNS = {
+    'scan_id': np.int32,
+    'timestamp': np.float64,
+    'motor_x': np.float32,
+    'motor_y': np.float32,
+    'x1': np.float32,
+    'y1': np.float32,
+    'x2': np.float32,
+    'y2': np.float32,
+    'cls': np.int16,
+    'conf': np.float32,
+    'world_x': np.float32,
+    'world_y': np.float32,
+}
+
+PLANT_COLUMNS = {
+    'plant_id': np.int32,
+    'x': np.float32,
+    'y': np.float32,
+    'scan_id': np.int32,
+    'detections': np.int32,
+    'updated_at': np.float64,
+}
+
+FRAME_W, FRAME_H = 640, 480
+PLANT_MATCH_RADIUS = 1.5  # motor units; a re-scanned plant this close to a known one keeps its id
+
+
+def world_centers(motor_x, motor_y, boxes, camera_fov_x: float = 3, camera_fov_y: float = 2):
+    """Motor (x, y) coordinates of box centers, with the same scale as merge_clusters_across_positions.
+
+    The camera is mounted rotated: pixel y runs along motor x and pixel x along motor y
+    (see goto_plant_center).
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    offset_px = ((boxes[:, 0] + boxes[:, 2]) / 2 - FRAME_W / 2) / FRAME_W * camera_fov_x * 2
+    offset_py = ((boxes[:, 1] + boxes[:, 3]) / 2 - FRAME_H / 2) / FRAME_H * camera_fov_y * 2
+    return motor_x + offset_py, motor_y + offset_px
+
+
+def _write_columns(path: str, columns: dict, schema: dict):
+    """Write a table as one .npy per column into `path`, replacing it atomically."""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, dtype in schema.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(columns[name], dtype=dtype))
+    old = f"{path}.old"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _read_columns(path: str, schema: dict, mmap: bool = True) -> dict:
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None) for name in schema}
+
+
+class ScanWriter:
+    """Collects the detections of one scan; close() writes them as a new segment."""
+
+    def __init__(self, store: 'ScanStore', scan_id: int):
+        self.store = store
+        self.scan_id = scan_id
+        self.timestamp = time.time()
+        self._rows = []  # (motor_x, motor_y, boxes (N, 6))
+
+    def add(self, motor_position, boxes):
+        """Record the (N, 6) x1, y1, x2, y2, conf, cls detections taken at `motor_position` (x, y)."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        if len(boxes):
+            self._rows.append((float(motor_position[0]), float(motor_position[1]), boxes))
+
+    def columns(self) -> dict:
+        boxes = np.concatenate([b for _, _, b in self._rows]) if self._rows else np.zeros((0, 6), np.float32)
+        motor_x = np.concatenate([np.full(len(b), x, np.float32) for x, _, b in self._rows]) if self._rows else np.zeros(0)
+        motor_y = np.concatenate([np.full(len(b), y, np.float32) for _, y, b in self._rows]) if self._rows else np.zeros(0)
+        world_x, world_y = world_centers(motor_x, motor_y, boxes[:, :4])
+        return {
+            'scan_id': np.full(len(boxes), self.scan_id),
+            'timestamp': np.full(len(boxes), self.timestamp),
+            'motor_x': motor_x,
+            'motor_y': motor_y,
+            'x1': boxes[:, 0],
+            'y1': boxes[:, 1],
+            'x2': boxes[:, 2],
+            'y2': boxes[:, 3],
+            'conf': boxes[:, 4],
+            'cls': boxes[:, 5],
+            'world_x': world_x,
+            'world_y': world_y,
+        }
+
+    def records(self, cls: int = 0) -> list[dict]:
+        """Detections of class `cls` in the list-of-dicts form merge_clusters_across_positions takes."""
+        return [{'motor_position': (x, y), 'bbox': box[:4].tolist(), 'detections': boxes.tolist()}
+                for x, y, boxes in self._rows for box in boxes if int(box[5]) == cls]
+
+    def close(self) -> int:
+        self.store.write_scan(self.scan_id, self.columns())
+        return self.scan_id
+
+
+class ScanStore(metaclass=Singleton):
+    """On-disk history of scan detections plus the current plant table.
+
+    Each scan is a segment directory of column files under `root/scans`; segments are
+    opened memory-mapped and cached, so querying the last few scans only touches those
+    files. The plant table (`root/plants`) is small and rewritten whole after each scan;
+    `root/known_plants` keeps the last known position of every plant id ever assigned.
+    """
+
+    def __init__(self, root: str = 'Data/scan_store'):
+        self.root = root
+        self._segments = {}  # scan_id -> columns (memory-mapped)
+        os.makedirs(os.path.join(root, 'scans'), exist_ok=True)
+
+    def _segment_path(self, scan_id: int) -> str:
+        return os.path.join(self.root, 'scans', f"{scan_id:06d}")
+
+    def scan_ids(self) -> list[int]:
+        names = os.listdir(os.path.join(self.root, 'scans'))
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def new_scan(self) -> ScanWriter:
+        ids = self.scan_ids()
+        return ScanWriter(self, ids[-1] + 1 if ids else 1)
+
+    def write_scan(self, scan_id: int, columns: dict):
+        _write_columns(self._segment_path(scan_id), columns, DETECTION_COLUMNS)
+        self._segments.pop(scan_id, None)
+        logger.info(f"Scan {scan_id}: stored {len(columns['scan_id'])} detections")
+
+    def segment(self, scan_id: int) -> dict:
+        columns = self._segments.get(scan_id)
+        if columns is None:
+            columns = self._segments[scan_id] = _read_columns(self._segment_path(scan_id), DETECTION_COLUMNS)
+        return columns
+
+    def detections(self, last: int = None, scan_ids=None, columns=None) -> dict:
+        """Detection columns of the given scans (default: the `last` N, or all), concatenated."""
+        if scan_ids is None:
+            scan_ids = self.scan_ids()
+            if last is not None:
+                scan_ids = scan_ids[-last:] if last > 0 else []
+        names = list(columns or DETECTION_COLUMNS)
+        segments = [self.segment(scan_id) for scan_id in scan_ids]
+        if not segments:
+            return {name: np.zeros(0, DETECTION_COLUMNS[name]) for name in names}
+        return {name: np.concatenate([segment[name] for segment in segments]) for name in names}
+
+    def near(self, x: float, y: float, radius: float, last: int = None, cls: int = None) -> dict:
+        """Detections whose center lies within `radius` of motor position (x, y), in the last N scans."""
+        scan_ids = self.scan_ids()
+        if last is not None:
+            scan_ids = scan_ids[-last:] if last > 0 else []
+        parts = []
+        for scan_id in scan_ids:
+            segment = self.segment(scan_id)
+            # Filter on the mapped position columns first; only matching rows are read from the rest
+            mask = (segment['world_x'] - x) ** 2 + (segment['world_y'] - y) ** 2 <= radius ** 2
+            if cls is not None:
+                mask &= segment['cls'] == cls
+            index = np.flatnonzero(mask)
+            if index.size:
+                parts.append({name: segment[name][index] for name in DETECTION_COLUMNS})
+        if not parts:
+            return {name: np.zeros(0, dtype) for name, dtype in DETECTION_COLUMNS.items()}
+        return {name: np.concatenate([part[name] for part in parts]) for name in DETECTION_COLUMNS}
+
+    def set_plants(self, centers, scan_id: int, detections=None) -> list[int]:
+        """Replace the plant table with `centers` [(x, y), ...] found by scan `scan_id`.
+
+        Each center within `PLANT_MATCH_RADIUS` of the last known position of any plant seen
+        so far keeps that plant's id (closest pairs first), so history, photos and change
+        detection stay attached to the same plant across re-scans, even one it was missing
+        from. New plants get ids never used before. Returns the ids in `centers` order.
+        """
+        centers = np.asarray(centers, dtype=np.float32).reshape(-1, 2)
+        count = len(centers)
+        known = self.known_plants()
+        ids = self._match_plant_ids(centers, known)
+        table = {name: np.asarray(column, dtype=PLANT_COLUMNS[name]) for name, column in {
+            'plant_id': ids,
+            'x': centers[:, 0],
+            'y': centers[:, 1],
+            'scan_id': np.full(count, scan_id),
+            'detections': np.zeros(count) if detections is None else detections,
+            'updated_at': np.full(count, time.time()),
+        }.items()}
+        # Plants not found this time keep their last known row
+        missing = ~np.isin(known['plant_id'], ids)
+        _write_columns(os.path.join(self.root, 'known_plants'),
+                       {name: np.concatenate([known[name][missing], table[name]]) for name in PLANT_COLUMNS},
+                       PLANT_COLUMNS)
+        _write_columns(os.path.join(self.root, 'plants'), table, PLANT_COLUMNS)
+        return ids.tolist()
+
+    def _match_plant_ids(self, centers: np.ndarray, known: dict) -> np.ndarray:
+        ids = np.full(len(centers), -1, dtype=np.int64)
+        if len(known['plant_id']) and len(centers):
+            distances = np.hypot(centers[:, None, 0] - known['x'][None, :], centers[:, None, 1] - known['y'][None, :])
+            taken = set()
+            for i, j in zip(*np.unravel_index(np.argsort(distances, axis=None), distances.shape)):
+                if distances[i, j] > PLANT_MATCH_RADIUS:
+                    break
+                if ids[i] < 0 and j not in taken:
+                    ids[i] = known['plant_id'][j]
+                    taken.add(j)
+
+        # The counter is kept on disk, so the id of a plant that disappeared is not handed out again
+        counter_path = os.path.join(self.root, 'next_plant_id')
+        try:
+            with open(counter_path, encoding='utf-8') as f:
+                next_id = int(f.read())
+        except (OSError, ValueError):
+            next_id = int(known['plant_id'].max()) + 1 if len(known['plant_id']) else 0
+        for i in np.flatnonzero(ids < 0):
+            ids[i] = next_id
+            next_id += 1
+        with open(counter_path, 'w', encoding='utf-8') as f:
+            f.write(str(next_id))
+        return ids
+
+    def plants(self) -> dict:
+        path = os.path.join(self.root, 'plants')
+        if not os.path.isdir(path):
+            return {name: np.zeros(0, dtype) for name, dtype in PLANT_COLUMNS.items()}
+        return _read_columns(path, PLANT_COLUMNS, mmap=False)
+
+    def known_plants(self) -> dict:
+        """Last known row of every plant id assigned so far, including plants missing from the current table."""
+        path = os.path.join(self.root, 'known_plants')
+        if not os.path.isdir(path):
+            return self.plants()  # written before the registry existed
+        return _read_columns(path, PLANT_COLUMNS, mmap=False)
+
+    def plant_positions(self) -> list[tuple[float, float]]:
+        """Motor positions of the known plants, for visiting each one."""
+        plants = self.plants()
+        return [(float(x), float(y)) for x, y in zip(plants['x'], plants['y'])]
+
+    def plant_sites(self) -> list[tuple[int, float, float]]:
+        """(plant id, x, y) of the known plants; the id stays the same across re-scans."""
+        plants = self.plants()
+        return [(int(n), float(x), float(y)) for n, x, y in zip(plants['plant_id'], plants['x'], plants['y'])]
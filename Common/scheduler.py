@@ -1,3 +1,111 @@
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
 import schedule
+from loguru import logger
+
+from .globalstate import GlobalState
+
+scheduler = schedule.Scheduler()
+
+
+def next_in_hour(hour: int, not_before: datetime.datetime) -> datetime.datetime:
+    """The first moment at or after `not_before` that falls in hour `hour` of a day:
+    `not_before` itself if it is in that hour, else the next hh:00."""
+    if not_before.hour == hour:
+        return not_before
+    at = not_before.replace(hour=hour, minute=0, second=0, microsecond=0)
+    return at if at > not_before else at + datetime.timedelta(days=1)
+
+
+class Timer:
+    """A callback due at wall-clock time `when` (epoch seconds), optionally repeating every `interval`."""
+
+    def __init__(self, when: float, callback, args=(), interval: float = None):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.cancelled = False
+
+    @property
+    def name(self) -> str:
+        return getattr(self.callback, '__qualname__', repr(self.callback))
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerQueue:
+    """Runs callbacks at exact times from one thread, instead of one polling loop per actuator.
+
+    Timers sit in a heap ordered by due time and the thread sleeps until the earliest
+    one, so an event fires on time rather than at the next poll. The sleep is capped
+    at `max_wait`, so a wall-clock jump (NTP sync after a power cycle) is noticed.
+    Callbacks run on the timer thread and should not block for long. The thread
+    starts with the first timer.
+    """
+
+    def __init__(self, max_wait: float = 60.0):
+        self.max_wait = max_wait
+        self._heap = []  # (when, order, timer)
+        self._order = itertools.count()
+        self._wakeup = threading.Condition()
+        self._thread = None
+
+    def call_at(self, when: float | datetime.datetime, callback, *args) -> Timer:
+        """Run `callback(*args)` at `when` (epoch seconds or a local datetime)."""
+        if isinstance(when, datetime.datetime):
+            when = when.timestamp()
+        return self._push(Timer(when, callback, args))
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        return self._push(Timer(time.time() + delay, callback, args))
+
+    def every(self, interval: float, callback, *args, first: float = None) -> Timer:
+        """Run `callback(*args)` every `interval` seconds, the first time after `first` seconds (default: now)."""
+        return self._push(Timer(time.time() + (first or 0.0), callback, args, interval))
+
+    def _push(self, timer: Timer) -> Timer:
+        with self._wakeup:
+            heapq.heappush(self._heap, (timer.when, next(self._order), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='timer-queue', daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+        return timer
+
+    def pending(self) -> list[dict]:
+        """Upcoming timers, soonest first."""
+        with self._wakeup:
+            entries = sorted(self._heap)
+        return [{'name': timer.name, 'when': when, 'interval': timer.interval}
+                for when, _, timer in entries if not timer.cancelled]
+
+    def _run(self):
+        while not GlobalState().is_shutting_down:
+            with self._wakeup:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                delay = self._heap[0][0] - time.time() if self._heap else self.max_wait
+                if delay > 0:
+                    self._wakeup.wait(min(delay, self.max_wait))
+                    continue
+                _, _, timer = heapq.heappop(self._heap)
+
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                logger.error(f"Timer {timer.name} failed: {e}")
+
+            if timer.interval and not timer.cancelled:
+                # Keep the cadence, but skip missed runs instead of firing them back to back
+                timer.when = max(timer.when + timer.interval, time.time())
+                self._push(timer)
+        logger.info("Timer queue exited.")
+
 
-scheduler = schedule.Scheduler()
\ No newline at end of file
+timers = TimerQueue()
@@ -11,6 +11,7 @@ class PlantBoxSerial(metaclass=Singleton):
     def __init__(self, port='COM3', baudrate=115200, timeout=1, serial_callback=None):
         self.ser = Serial(port, baudrate, timeout=timeout)
         self.serial_callback = serial_callback
+        self.listeners = []
         self.latest_line = None
         Thread(target=self._read_serial, daemon=True).start()
 
@@ -21,11 +22,19 @@ class PlantBoxSerial(metaclass=Singleton):
                     line = self.ser.readline().decode().strip()
                     if line:
                         self.latest_line = line
+                        for listener in self.listeners:
+                            listener(line)
                         if self.serial_callback:
                             self.serial_callback(line)
                 except:
                     pass
-            time.sleep(0.1)
+            else:
+                # Only idle when there is nothing to read, so bursts are drained at line rate
+                time.sleep(0.1)
+
+    def add_listener(self, listener):
+        """Call `listener(line)` from the reader thread for every line received."""
+        self.listeners.append(listener)
 
     def write(self, data):
         if isinstance(data, str):
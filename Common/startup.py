@@ -0,0 +1,126 @@
+import threading
+import time
+
+from loguru import logger
+
+from .state_store import status_store
+
+
+class Component:
+    """One thing to bring up at startup: a factory, the components it needs first and a timeout."""
+
+    def __init__(self, name: str, factory, requires=(), timeout: float = 10.0):
+        self.name = name
+        self.factory = factory
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        self.status = 'pending'  # pending, starting, ready, failed, timeout, skipped
+        self.value = None
+        self.error = None
+        self.started_at = None
+        self.elapsed = None
+        self.done = threading.Event()
+
+    def as_dict(self):
+        return {
+            'status': self.status,
+            'requires': list(self.requires),
+            'elapsed': None if self.elapsed is None else round(self.elapsed, 2),
+            'error': self.error,
+        }
+
+
+class Startup:
+    """Brings up devices and services concurrently instead of one after another.
+
+    Every component starts as soon as the ones it requires are ready, on its own thread,
+    and gets `timeout` seconds; one that fails or times out marks its dependents as
+    skipped instead of hanging startup. Progress is published as 'startup', so the
+    dashboard (already serving) shows which parts are ready. A component that finishes
+    after its timeout is still recorded as ready, but run() has already returned without it.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, factory, requires=(), timeout: float = 10.0):
+        unknown = [r for r in requires if r not in self.components]
+        if unknown:
+            raise KeyError(f"{name} requires unknown components: {unknown}")
+        self.components[name] = Component(name, factory, requires, timeout)
+
+    def run(self) -> dict:
+        """Start everything and wait until each component is ready, failed, timed out or skipped.
+        Returns {name: value}, with None for components that are not ready."""
+        start = time.perf_counter()
+        self.publish()
+        for component in self.components.values():
+            threading.Thread(target=self._bring_up, args=(component,), name=f"startup-{component.name}",
+                             daemon=True).start()
+        for component in self.components.values():
+            component.done.wait()
+        logger.info(f"Startup finished in {time.perf_counter() - start:.1f} s: "
+                    + ', '.join(f"{c.name} {c.status}" for c in self.components.values()))
+        return {name: c.value if c.status == 'ready' else None for name, c in self.components.items()}
+
+    def ready(self, name: str) -> bool:
+        return self.components[name].status == 'ready'
+
+    def get(self, name: str):
+        """Value of a ready component (for factories of the components that require it), else None."""
+        component = self.components[name]
+        return component.value if component.status == 'ready' else None
+
+    def _bring_up(self, component: Component):
+        for name in component.requires:
+            dependency = self.components[name]
+            dependency.done.wait()
+            if dependency.status != 'ready':
+                self._finish(component, 'skipped', f"{name} is {dependency.status}")
+                return
+
+        component.started_at = time.perf_counter()
+        self._set(component, 'starting')
+        finished = threading.Event()
+
+        def call():
+            try:
+                value = component.factory()
+            except Exception as e:
+                self._finish(component, 'failed', str(e))
+            else:
+                component.value = value
+                if component.done.is_set():
+                    logger.warning(f"{component.name} became ready after its {component.timeout} s timeout")
+                self._finish(component, 'ready')
+            finally:
+                finished.set()
+
+        threading.Thread(target=call, name=f"startup-{component.name}-factory", daemon=True).start()
+        if not finished.wait(component.timeout):
+            self._finish(component, 'timeout', f"not ready after {component.timeout} s")
+
+    def _finish(self, component: Component, status: str, error: str = None):
+        with self._lock:
+            if component.done.is_set() and status != 'ready':
+                return  # already timed out; a late failure changes nothing
+            component.status = status
+            component.error = error
+            if component.started_at is not None:
+                component.elapsed = time.perf_counter() - component.started_at
+            component.done.set()
+        if status != 'ready':
+            logger.error(f"Startup: {component.name} {status}: {error}")
+        self.publish()
+
+    def _set(self, component: Component, status: str):
+        component.status = status
+        self.publish()
+
+    def publish(self):
+        with self._lock:
+            status_store.set('startup', {
+                'ready': all(c.status == 'ready' for c in self.components.values()),
+                'components': {name: c.as_dict() for name, c in self.components.items()},
+            })
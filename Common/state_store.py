@@ -0,0 +1,85 @@
+import copy
+import json
+from threading import Lock
+
+
+class StateStore:
+    """Versioned key/value store for dashboard state.
+
+    Every change bumps a global version and records it against the key, so a publisher
+    can send only the fields changed since the last version it saw. Setting a key to an
+    equal value is a no-op.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._values = {}
+        self._versions = {}
+        self.version = 0
+        self._json_cache = (-1, None)
+
+    def set(self, key: str, value) -> bool:
+        """Store a copy of `value` under `key`. Returns True if it changed."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._values and self._values[key] == value:
+                return False
+            self.version += 1
+            self._values[key] = value
+            self._versions[key] = self.version
+            return True
+
+    def update(self, **values) -> bool:
+        changed = False
+        for key, value in values.items():
+            changed = self.set(key, value) or changed
+        return changed
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return copy.deepcopy(self._values.get(key, default))
+
+    def changes_since(self, version: int) -> tuple[int, dict]:
+        """Return the current version and the fields changed after `version`."""
+        with self._lock:
+            changes = {key: self._values[key] for key, v in self._versions.items() if v > version}
+            return self.version, copy.deepcopy(changes)
+
+    def snapshot(self) -> tuple[int, dict]:
+        return self.changes_since(-1)
+
+    def snapshot_json(self) -> str:
+        """Serialized snapshot, re-encoded only when the version has moved."""
+        with self._lock:
+            version, cached = self._json_cache
+            if version == self.version:
+                return cached
+            version = self.version
+            cached = json.dumps(self._values)
+            self._json_cache = (version, cached)
+            return cached
+
+
+class PublishedDict(dict):
+    """A dict that mirrors assignments to selected keys into a StateStore.
+
+    `hooks` maps other keys to callables that receive each value assigned to them.
+    """
+
+    def __init__(self, store: StateStore, published_keys, *args, hooks: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+        self.published_keys = set(published_keys)
+        self.hooks = hooks or {}
+        for key in self.published_keys & self.keys():
+            store.set(key, self[key])
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in self.published_keys:
+            self.store.set(key, value)
+        if key in self.hooks:
+            self.hooks[key](value)
+
+
+status_store = StateStore()
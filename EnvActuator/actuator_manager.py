@@ -1,3 +1,7 @@
+import datetime
+
+from loguru import logger
+
 from Agent.PlantRequirements import PlantRequirementsResult
 from Common import Singleton
 
@@ -18,9 +22,39 @@ class ActuatorManager(metaclass=Singleton):
         self.wind_actuator = WindActuator()
 
     def update(self, requirements: PlantRequirementsResult):
-        self.requirements = requirements
+        """Apply `requirements` to every actuator. Raises ValueError if one rejects them; they are
+        only kept (and checkpointed) once all actuators have accepted them."""
         self.water_actuator.update_watering(requirements.watering_frequency, requirements.watering_amount)
         self.sunlight_actuator.update_light(requirements.light_type, requirements.light_duration)
         self.temperature_actuator.update_temperature(requirements.temperature)
         self.fertilization_actuator.update_fertilization(requirements.fertilization_frequency, requirements.fertilization_amount)
         self.wind_actuator.update_wind(requirements.wind)
+        self.requirements = requirements
+
+    def state(self) -> dict:
+        """Requirements and the last watering/fertilization times, for the checkpoint."""
+        requirements = self.requirements if isinstance(self.requirements, PlantRequirementsResult) else None
+        last_watering = self.water_actuator.last_watering_date
+        last_fertilization = self.fertilization_actuator.last_fertilization_time
+        return {
+            'requirements': requirements.model_dump() if requirements else None,
+            'last_watering_date': last_watering.isoformat() if last_watering else None,
+            'last_fertilization_time': last_fertilization.isoformat() if last_fertilization else None,
+        }
+
+    def restore(self, state: dict):
+        """Re-apply checkpointed requirements without asking the agents again."""
+        if state.get('requirements'):
+            try:
+                self.update(PlantRequirementsResult.model_validate(state['requirements']))
+            except ValueError as e:
+                # Still restore the times below, so watering and fertilization keep their cadence
+                logger.error(f"Checkpointed requirements not re-applied: {e}")
+        if state.get('last_watering_date'):
+            self.water_actuator.last_watering_date = datetime.date.fromisoformat(state['last_watering_date'])
+        if state.get('last_fertilization_time'):
+            self.fertilization_actuator.last_fertilization_time = datetime.datetime.fromisoformat(
+                state['last_fertilization_time'])
+        # Re-plan from the restored times rather than the ones update() saw
+        self.water_actuator.schedule()
+        self.fertilization_actuator.schedule()
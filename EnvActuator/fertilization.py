@@ -1,18 +1,16 @@
-import threading
 import datetime
-import time
+import math
 from loguru import logger
-from Common import GlobalState
+from Common import timers
+from Common.scheduler import next_in_hour
 
 
 class FertilizationActuator:
     def __init__(self):
         self.fertilization_frequency = 0.0 # in days, 0 means no fertilization needed
         self.fertilization_amount = 0.0 # in ml each time
-
-        # I do not want to block main thread
-        self.managing_thread = threading.Thread(target=self.managing_loop, daemon=True)
-        self.managing_thread.start()
+        self.last_fertilization_time = None
+        self._timer = None
         logger.info("Fertilization managing actuator initialized.")
 
     def update_fertilization(self, frequency: float, amount: float):
@@ -20,21 +18,26 @@ class FertilizationActuator:
         self.fertilization_frequency = frequency
         self.fertilization_amount = amount
         logger.info(f"Fertilization updated: frequency={frequency} days, amount={amount} ml")
+        self.schedule()
 
+    def schedule(self):
+        """Plan the next fertilization: at noon, once `fertilization_frequency` days have passed since the last one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.fertilization_frequency <= 0:
+            return
+        due = datetime.datetime.now()
+        if self.last_fertilization_time is not None:
+            due = max(due, self.last_fertilization_time + datetime.timedelta(days=math.ceil(self.fertilization_frequency)))
+        self._timer = timers.call_at(next_in_hour(12, due), self._fertilize)
 
-    def managing_loop(self):
-        """A loop to manage the fertilization based on the frequency. Provide fertilization at noon."""
-        last_fertilization_time = None
-        while not GlobalState().is_shutting_down:
-            if self.fertilization_frequency > 0:
-                now = datetime.datetime.now()
-                if now.hour == 12 and (last_fertilization_time is None or (now - last_fertilization_time).days >= self.fertilization_frequency):
-                    self.provide_fertilization(self.fertilization_amount)
-                    last_fertilization_time = now
-            time.sleep(60)
-        logger.info("Fertilization managing loop exited.")
+    def _fertilize(self):
+        self.provide_fertilization(self.fertilization_amount)
+        self.last_fertilization_time = datetime.datetime.now()
+        self.schedule()
 
     def provide_fertilization(self, amount: float):
         """Providing fertilization."""
         logger.info(f"Provided {amount} ml of fertilizer.")
-        pass
\ No newline at end of file
+        pass
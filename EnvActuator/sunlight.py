@@ -1,8 +1,7 @@
-import threading
 import datetime
 import time
 from loguru import logger
-from Common import GlobalState, PlantBoxSerial
+from Common import GlobalState, PlantBoxSerial, timers
 
 
 class LightActuator:
@@ -17,10 +16,7 @@ class LightActuator:
 
         # The light_duration is on or off?
         self.is_light_on = False
-
-        # I do not want to block main thread
-        self.managing_thread = threading.Thread(target=self.managing_loop, daemon=True)
-        self.managing_thread.start()
+        self._timer = None
         logger.info("Sunlight managing actuator initialized.")
 
     def update_light(self, light_type: int, duration: float):
@@ -35,18 +31,27 @@ class LightActuator:
         self.start_time = (datetime.datetime.combine(datetime.date.today(), noon) - half_duration).time()
         self.end_time = (datetime.datetime.combine(datetime.date.today(), noon) + half_duration).time()
         logger.info(f"Updated light: type={light_type}, duration={duration} hours, start_time={self.start_time}, end_time={self.end_time}")
+        self.apply_schedule()
 
-    def managing_loop(self):
-        """Continuously manage light_duration based on the set duration."""
-        while not GlobalState().is_shutting_down:
-            if self.light_duration > 0:
-                now = datetime.datetime.now().time()
-                if self.start_time <= now <= self.end_time:
-                    self.provide_light(self.light_type)
-                else:
-                    self.stop_light()
-            time.sleep(60)
-        logger.info("Sunlight managing loop exited.")
+    def apply_schedule(self):
+        """Set the light to what the schedule says now and plan the next switch at start_time or end_time.
+        Jobs call this after photographing to hand the light back to the schedule."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.light_duration <= 0:
+            self.stop_light()
+            return
+        now = datetime.datetime.now()
+        start = datetime.datetime.combine(now.date(), self.start_time)
+        end = datetime.datetime.combine(now.date(), self.end_time)
+        if start <= now <= end:
+            self.provide_light(self.light_type)
+            next_switch = end
+        else:
+            self.stop_light()
+            next_switch = start if now < start else start + datetime.timedelta(days=1)
+        self._timer = timers.call_at(next_switch, self.apply_schedule)
 
     def provide_light(self, light_type: int):
         self.is_light_on = True
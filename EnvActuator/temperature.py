@@ -1,9 +1,9 @@
-import threading
-import time
 from loguru import logger
-from Common import GlobalState
+from Common import timers
 import Sensors
 
+CHECK_INTERVAL = 30  # seconds between thermostat checks
+
 
 class TemperatureActuator:
     def __init__(self):
@@ -13,9 +13,7 @@ class TemperatureActuator:
         # is the heater on or off?
         self.is_heater_on = False
 
-        # I do not want to block main thread
-        self.managing_thread = threading.Thread(target=self.managing_loop, daemon=True)
-        self.managing_thread.start()
+        timers.every(CHECK_INTERVAL, self.check_temperature)
         logger.info("Temperature managing actuator initialized.")
 
     def update_temperature(self, temperature: float):
@@ -23,17 +21,16 @@ class TemperatureActuator:
         self.target_temperature = temperature
         logger.info(f"Updated desired temperature to {temperature}°C.")
 
-    def managing_loop(self):
-        """Continuously manage temperature based on the set temperature."""
-        while not GlobalState().is_shutting_down:
-            if self.target_temperature > 0:
-                current_temp = Sensors.get_sensor_temperature()
-                if current_temp < self.target_temperature - self._difference_threshold and not self.is_heater_on:
-                    self.provide_heat()
-                elif current_temp > self.target_temperature + self._difference_threshold and self.is_heater_on:
-                    self.stop_heat()
-            time.sleep(30)
-        logger.info("Temperature managing loop exited.")
+    def check_temperature(self):
+        """Switch the heater around the set temperature, with a hysteresis of `_difference_threshold`."""
+        if self.target_temperature > 0:
+            current_temp = Sensors.get_sensor_temperature()
+            if current_temp is None:
+                pass  # no reading from the firmware yet
+            elif current_temp < self.target_temperature - self._difference_threshold and not self.is_heater_on:
+                self.provide_heat()
+            elif current_temp > self.target_temperature + self._difference_threshold and self.is_heater_on:
+                self.stop_heat()
 
     def provide_heat(self):
         self.is_heater_on = True
@@ -1,18 +1,16 @@
-import threading
 import datetime
-import time
+import math
 from loguru import logger
-from Common import GlobalState
+from Common import timers
+from Common.scheduler import next_in_hour
 
 
 class WateringActuator:
     def __init__(self):
-        self.watering_frequency = 0.0 # 1 time per x day
+        self.watering_frequency = 0.0 # 1 time per x day, 0 means no watering
         self.watering_amount = 0.0 # ml each time
-
-        # I do not want to block main thread
-        self.managing_thread = threading.Thread(target=self.managing_loop, daemon=True)
-        self.managing_thread.start()
+        self.last_watering_date = None
+        self._timer = None
         logger.info("Watering managing actuator initialized.")
 
     def update_watering(self, frequency: float, amount: float):
@@ -24,17 +22,26 @@ class WateringActuator:
         self.watering_frequency = frequency
         self.watering_amount = amount
         logger.info(f"Updated watering frequency to {frequency} days and amount to {amount} ml.")
+        self.schedule()
+
+    def schedule(self):
+        """Plan the next watering: at noon, on the first day at least `watering_frequency` days after the last one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.watering_frequency <= 0:
+            return
+        now = datetime.datetime.now()
+        due = now
+        if self.last_watering_date is not None:
+            next_date = self.last_watering_date + datetime.timedelta(days=math.ceil(self.watering_frequency))
+            due = max(now, datetime.datetime.combine(next_date, datetime.time.min))
+        self._timer = timers.call_at(next_in_hour(12, due), self._water)
 
-    def managing_loop(self):
-        """Continuously manage watering based on the set frequency. Will water at noon"""
-        last_watering_date = None
-        while not GlobalState().is_shutting_down:
-            now = datetime.datetime.now()
-            if (last_watering_date is None or (now.date() - last_watering_date).days >= self.watering_frequency) and now.time().hour == 12:
-                self.provide_water()
-                last_watering_date = now.date()
-            time.sleep(60)
-        logger.info("Watering managing loop exited.")
+    def _water(self):
+        self.provide_water()
+        self.last_watering_date = datetime.date.today()
+        self.schedule()
 
     def provide_water(self):
         logger.info(f"Providing {self.watering_amount}ml of water...")
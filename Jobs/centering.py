@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+from loguru import logger
+
+import MotorContol
+from Common.frame_hub import camera_hub, yolo_hub
+from Common.job_runner import job_sleep
+from Yolo import annotate, detect
+
+
+def goto_plant_center(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, flask_state: dict) -> bool:
+    """Step the gantry until the detected plant is centered. Returns whether it got there."""
+    step_size = 0.15  # Small incremental movement
+    for _ in range(20):
+        if not camera.isOpened():
+            raise IOError("Cannot open webcam")
+        slot = camera_hub.capture(camera)
+
+        if slot is None:
+            logger.warning(f"Failed to capture at ({motor.current_x}, {motor.current_y})")
+            continue
+
+        with slot:
+            detections = detect(slot, 'leaf')
+            with yolo_hub.write(slot.array.shape) as annotated_frame:
+                annotate(slot.array, detections, annotated_frame)
+            frame_h, frame_w = slot.array.shape[:2]
+
+        plant_boxes = detections.of_class(0).xyxy.tolist()
+        if not plant_boxes:
+            logger.warning("No plant detected")
+            continue
+        x1, y1, x2, y2 = plant_boxes[0]
+        leaf_top_x = (x1 + x2) / 2
+        leaf_top_y = (y1 + y2) / 2
+
+        center_x, center_y = frame_w / 2, frame_h / 2
+
+        # Calculate distance for each axis
+        distance_x = abs(leaf_top_x - center_x)
+        distance_y = abs(leaf_top_y - center_y)
+
+        logger.debug(f"Distance from center: x={distance_x:.2f}, y={distance_y:.2f} pixels")
+
+        if distance_x < 20 and distance_y < 20:
+            logger.info("Leaf centered")
+            return True
+
+        # Move incrementally towards leaf
+        current_motor_x, current_motor_y = motor.get_position()[:2]
+
+        motor_x = current_motor_x if distance_y < 10 else current_motor_x + (
+            -step_size if leaf_top_y < center_y else step_size)
+        motor_y = current_motor_y if distance_x < 10 else current_motor_y + (
+            -step_size if leaf_top_x < center_x else step_size)
+
+        motor_x = max(0, min(9.5, motor_x))
+        motor_y = max(0, min(9.0, motor_y))
+
+        logger.info(
+            f"Leaf at ({leaf_top_x:.0f}, {leaf_top_y:.0f}), center ({center_x:.0f}, {center_y:.0f}), moving to ({motor_x:.2f}, {motor_y:.2f})")
+        motor.goto(motor_x, motor_y, 0)
+        job_sleep(2)
+    logger.warning("Leaf not centered, photographing from here")
+    return False
+
+
+def photograph_plant(camera: cv2.VideoCapture, motor: MotorContol.MotorControl,
+                     flask_state: dict) -> tuple[np.ndarray | None, tuple | None]:
+    """Center on the plant under the camera and take a photo of it.
+
+    Returns (photo, box (x1, y1, x2, y2) of the plant in that photo, or None), or
+    (None, None) if the capture failed. The box comes from the photo itself, since the
+    gantry may have moved after the last detection made while centering.
+    """
+    goto_plant_center(camera, motor, flask_state)
+    # take a photo!
+    if not camera.isOpened():
+        raise IOError("Cannot open webcam")
+    frame = camera_hub.read(camera)
+    if frame is None:
+        return None, None
+    plant_boxes = detect(frame, 'leaf').of_class(0).xyxy.tolist()
+    return frame, tuple(plant_boxes[0]) if plant_boxes else None
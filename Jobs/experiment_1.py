@@ -1,16 +1,15 @@
-import time
 from loguru import logger
-from Yolo import get_model
+from Common.frame_hub import camera_hub
+from Common.job_runner import check_cancelled, job_sleep
+from Yolo import annotate, detect
 
 
-def experiment_1(cam, motor, flask_state, socketio):
+def experiment_1(cam, motor, flask_state):
     """
     Experiment 1 is the spray test
     :return:
     """
 
-    flask_state['job_status'] = 'running'
-    socketio.emit('job_status', {'status': 'running'})
     logger.info("Starting job")
 
     motor.ser.write("0,2,0".encode())
@@ -22,53 +21,38 @@ def experiment_1(cam, motor, flask_state, socketio):
 
     motor.goto(0, 0, 0)
     motor.set_servo_angles(servo_1=0, servo_2=90, servo_3=0)
-    time.sleep(3)
+    job_sleep(3)
 
     leaves = []
 
     for i, x in enumerate(x_positions): # zig-zag pattern
-        if flask_state['job_control']['should_stop']:
-            logger.info("Job stopped by user")
-            flask_state['job_status'] = 'stopped'
-            socketio.emit('job_status', {'status': 'stopped'})
-            return
+        check_cancelled()
         y_range = reversed(y_positions) if i % 2 else y_positions
-        time.sleep(1)
+        job_sleep(1)
 
         flag = False
 
         for y in y_range:
-            if flask_state['job_control']['should_stop']:
-                logger.info("Job stopped by user")
-                flask_state['job_status'] = 'stopped'
-                socketio.emit('job_status', {'status': 'stopped'})
-                return
+            check_cancelled()
 
             motor.move_to(x, y, 0)
-            time.sleep(1)
+            job_sleep(1)
 
             logger.debug(f"Moved to ({x}, {y})")
 
             if not cam.isOpened():
                 raise IOError("Cannot open webcam")
-            ret, frame = cam.read()
+            frame = camera_hub.read(cam)
 
-            if not ret:
+            if frame is None:
                 logger.warning(f"Failed to capture at ({x}, {y})")
                 continue
 
-            model = get_model()
-            results = model(frame)
-            annotated_frame = results[0].plot()
+            detections = detect(frame, 'leaf')
+            annotated_frame = annotate(frame, detections)
 
             # Filter out fruits (assuming class 1 is fruit, class 0 is plant)
-            if len(results[0].boxes) > 0:
-                plant_boxes = []
-                for box in results[0].boxes:
-                    if int(box.cls[0]) == 0:  # Only keep plants (class 0)
-                        plant_boxes.append(box.xyxy[0].tolist())
-            else:
-                plant_boxes = []
+            plant_boxes = detections.of_class(0).xyxy.tolist()
 
             flask_state['yolo_frame'] = annotated_frame
 
@@ -84,32 +68,23 @@ def experiment_1(cam, motor, flask_state, socketio):
 
     if not leaves:
         logger.warning("No leaves detected")
-        flask_state['job_status'] = 'stopped'
-        socketio.emit('job_status', {'status': 'stopped'})
         return
 
     for _ in range(5):
         if not cam.isOpened():
             raise IOError("Cannot open webcam")
-        ret, frame = cam.read()
+        frame = camera_hub.read(cam)
 
-        if not ret:
+        if frame is None:
             logger.warning(f"Failed to capture at ({x}, {y})")
             continue
 
-        model = get_model()
-        results = model(frame)
-        annotated_frame = results[0].plot()
+        detections = detect(frame, 'leaf')
+        annotated_frame = annotate(frame, detections)
         flask_state['yolo_frame'] = annotated_frame
 
         # Filter out fruits (assuming class 1 is fruit, class 0 is plant)
-        if len(results[0].boxes) > 0:
-            plant_boxes = []
-            for box in results[0].boxes:
-                if int(box.cls[0]) == 0:  # Only keep plants (class 0)
-                    plant_boxes.append(box.xyxy[0].tolist())
-        else:
-            plant_boxes = []
+        plant_boxes = detections.of_class(0).xyxy.tolist()
 
         if not plant_boxes:
             break
@@ -142,7 +117,7 @@ def experiment_1(cam, motor, flask_state, socketio):
 
         logger.info(f"Moving to top of leaf at motor ({motor_x:.2f}, {motor_y:.2f})")
         motor.goto(motor_x, motor_y, 0)
-        time.sleep(2.5)
+        job_sleep(2.5)
 
     logger.debug(motor.get_position())
 
@@ -154,12 +129,12 @@ def experiment_1(cam, motor, flask_state, socketio):
     motor_y = max(0, min(9.0, current_motor_y + to_spray_y_offset))
     motor.goto(motor_x, motor_y, 0)
     logger.debug(motor.get_position())
-    time.sleep(5)
+    job_sleep(5)
 
     motor.ser.write("0,2,100")
-    time.sleep(3)
+    job_sleep(3)
     motor.ser.write("0,2,0")
 
-    time.sleep(10)
+    job_sleep(10)
     motor.goto(0,0,0)
 
@@ -1,12 +1,12 @@
-import re
 import time
 from loguru import logger
-from Yolo import get_model
+from Common.frame_hub import camera_hub
+from Common.job_runner import check_cancelled, job_sleep
+from Sensors import SensorStream
+from Yolo import annotate, detect
 
 
-def experiment_2(cam, motor, flask_state, socketio):
-    flask_state['job_status'] = 'running'
-    socketio.emit('job_status', {'status': 'running'})
+def experiment_2(cam, motor, flask_state):
     logger.info("Starting job")
 
     motor.ser.write("0,2,0".encode())
@@ -18,53 +18,38 @@ def experiment_2(cam, motor, flask_state, socketio):
 
     motor.goto(0, 0, 0)
     motor.set_servo_angles(servo_1=0, servo_2=90, servo_3=0)
-    time.sleep(3)
+    job_sleep(3)
 
     leaves = []
 
     for i, x in enumerate(x_positions):  # zig-zag pattern
-        if flask_state['job_control']['should_stop']:
-            logger.info("Job stopped by user")
-            flask_state['job_status'] = 'stopped'
-            socketio.emit('job_status', {'status': 'stopped'})
-            return
+        check_cancelled()
         y_range = reversed(y_positions) if i % 2 else y_positions
-        time.sleep(1)
+        job_sleep(1)
 
         flag = False
 
         for y in y_range:
-            if flask_state['job_control']['should_stop']:
-                logger.info("Job stopped by user")
-                flask_state['job_status'] = 'stopped'
-                socketio.emit('job_status', {'status': 'stopped'})
-                return
+            check_cancelled()
 
             motor.move_to(x, y, 0)
-            time.sleep(1)
+            job_sleep(1)
 
             logger.debug(f"Moved to ({x}, {y})")
 
             if not cam.isOpened():
                 raise IOError("Cannot open webcam")
-            ret, frame = cam.read()
+            frame = camera_hub.read(cam)
 
-            if not ret:
+            if frame is None:
                 logger.warning(f"Failed to capture at ({x}, {y})")
                 continue
 
-            model = get_model()
-            results = model(frame)
-            annotated_frame = results[0].plot()
+            detections = detect(frame, 'leaf')
+            annotated_frame = annotate(frame, detections)
 
             # Filter out fruits (assuming class 1 is fruit, class 0 is plant)
-            if len(results[0].boxes) > 0:
-                plant_boxes = []
-                for box in results[0].boxes:
-                    if int(box.cls[0]) == 0:  # Only keep plants (class 0)
-                        plant_boxes.append(box.xyxy[0].tolist())
-            else:
-                plant_boxes = []
+            plant_boxes = detections.of_class(0).xyxy.tolist()
 
             flask_state['yolo_frame'] = annotated_frame
 
@@ -80,26 +65,23 @@ def experiment_2(cam, motor, flask_state, socketio):
 
     if not leaves:
         logger.warning("No leaves detected")
-        flask_state['job_status'] = 'stopped'
-        socketio.emit('job_status', {'status': 'stopped'})
         return
 
     step_size = 0.15  # Small incremental movement
-    model = get_model()
     for _ in range(20):
         if not cam.isOpened():
             raise IOError("Cannot open webcam")
-        ret, frame = cam.read()
+        frame = camera_hub.read(cam)
 
-        if not ret:
+        if frame is None:
             logger.warning(f"Failed to capture at ({x}, {y})")
             continue
 
-        results = model(frame)
-        annotated_frame = results[0].plot()
+        detections = detect(frame, 'leaf')
+        annotated_frame = annotate(frame, detections)
         flask_state['yolo_frame'] = annotated_frame
 
-        plant_boxes = [box.xyxy[0].tolist() for box in results[0].boxes if int(box.cls[0]) == 0]
+        plant_boxes = detections.of_class(0).xyxy.tolist()
         if not plant_boxes:
             logger.warning("No plant detected")
             continue
@@ -131,33 +113,27 @@ def experiment_2(cam, motor, flask_state, socketio):
 
         logger.info(f"Leaf at ({leaf_top_x:.0f}, {leaf_top_y:.0f}), center ({center_x:.0f}, {center_y:.0f}), moving to ({motor_x:.2f}, {motor_y:.2f})")
         motor.goto(motor_x, motor_y, 0)
-        time.sleep(2)
+        job_sleep(2)
 
     logger.debug(motor.get_position())
 
     motor.goto(motor.current_x, motor.current_y, 1.5)
-    time.sleep(4)
-
-    count = 0
-    humidity = []
-    while count < 10:
-        response = motor.ser.readline().strip()
-        if response.startswith("婀垮害鍊?"):
-            try:
-                hum_value = re.search(r'\d+\.?\d*', response).group()
-                humidity.append(hum_value)
-                count += 1
-                logger.debug(f"Humidity reading {count}: {hum_value}%")
-                time.sleep(2)
-            except ValueError:
-                logger.warning(f"Invalid humidity value received: {response}")
-
-    humidity.sort()
-    humidity = humidity[1:-1]  # Remove highest and lowest
-    average_humidity = sum(map(float, humidity)) / len(humidity)
-    logger.info(f"Average humidity: {average_humidity:.2f}%")
+    job_sleep(4)
+
+    # Average 10 fresh readings from the probe, dropping the highest and lowest
+    humidity = SensorStream().channel('humidity')
+    probe_down_at = time.time()
+    for _ in range(120):  # up to 60 s, in steps short enough to stay cancellable
+        if humidity.wait_for(10, since=probe_down_at, timeout=0.5):
+            break
+        check_cancelled()
+    else:
+        logger.warning(f"Only {len(humidity.window(since=probe_down_at)[1])} humidity readings received")
+    average_humidity = humidity.trimmed_mean(count=10, since=probe_down_at, trim=1)
+    if average_humidity is not None:
+        logger.info(f"Average humidity: {average_humidity:.2f}%")
 
     motor.goto(motor.current_x, motor.current_y, 0)
-    time.sleep(2.5)
+    job_sleep(2.5)
 
 
@@ -1,94 +1,75 @@
 import math
-import time
 
 import cv2
-import flask_socketio
 import numpy as np
 from loguru import logger
 
 import MotorContol
 from Agent import PlantRecognition, PlantRequirements
-from Common import GlobalState
+from Agent.payload import crop_to_box
+from Common import status_store
+from Common.change_gate import ChangeGate
+from Common.checkpoint import Checkpointer
 from Common.cluster_merge import merge_clusters_across_positions
+from Common.frame_hub import camera_hub
+from Common.image_descriptors import color_descriptor
+from Common.job_runner import check_cancelled, job_sleep, report_progress
+from Common.scan_store import ScanStore, ScanWriter
 from EnvActuator import ActuatorManager
-from Yolo import get_model
+from Yolo import annotate, detect
+from .centering import photograph_plant
+from .job import majority_plant
 
 
-
-def init_plant_scan(cam: cv2.VideoCapture, motor: MotorContol.MotorControl, flask_state: dict, socketio: flask_socketio.SocketIO,
+def init_plant_scan(cam: cv2.VideoCapture, motor: MotorContol.MotorControl, flask_state: dict,
                     recognition_agent: PlantRecognition.PlantRecognitionAgent,
                     requirements_agent: PlantRequirements.PlantRequirementsAgent, manager: ActuatorManager):
-    flask_state['job_status'] = 'running'
-    socketio.emit('job_status', {'status': 'running'})
     logger.info("Starting job")
 
-    step_x, step_y = 3, 1.5
-    x_positions = [i * step_x for i in range(int(9.5 / step_x) + 1)]
-    y_positions = [j * step_y for j in range(int(9.0 / step_y) + 1)]
-
     motor.goto(0, 0, 0)
     motor.set_servo_angles(servo_1=0, servo_2=90, servo_3=0)
-    time.sleep(5)
+    job_sleep(5)
 
-    # Clear previous YOLO frame and scan data
+    # Clear previous YOLO frame
     flask_state['yolo_frame'] = None
-    GlobalState().scan_data = []
+    scan = ScanStore().new_scan()
     manager.sunlight_actuator.provide_light(2)
-    for i, x in enumerate(x_positions):  # zig-zag pattern
-        y_range = reversed(y_positions) if i % 2 else y_positions
-        time.sleep(1)
-
-        for y in y_range:
-            # Check for stop signal
-            if flask_state['job_control']['should_stop']:
-                logger.info("Job stopped by user")
-                flask_state['job_status'] = 'stopped'
-                socketio.emit('job_status', {'status': 'stopped'})
-                return
-
-            motor.move_to(x, y, 0)
-            time.sleep(1)
-            logger.debug(f"Moved to ({x}, {y})")
-
-            annotated_frame = detect_and_save_plant(cam, x, y)
-            if annotated_frame is not None:
-                flask_state['yolo_frame'] = annotated_frame
-            else:
-                continue
+    try:
+        scan_grid(cam, motor, flask_state, scan)
+        scan.close()
 
-    merged_clusters_group = merge_clusters_across_positions(GlobalState().scan_data, eps=2, min_samples=1,
-                                                            camera_fov_x=3, camera_fov_y=2)
-    flask_state['yolo_frame'] = visualize_cluster_group(merged_clusters_group, 3, 2)
-    time.sleep(5)
+        scan_records = scan.records(cls=0)
+        merged_clusters_group = merge_clusters_across_positions(scan_records, eps=2, min_samples=1,
+                                                                camera_fov_x=3, camera_fov_y=2)
+        flask_state['yolo_frame'] = visualize_cluster_group(merged_clusters_group, scan_records, 3, 2)
+        job_sleep(5)
 
-    plants = get_cluster_group_centers(merged_clusters_group)
-    GlobalState().scan_data = plants
+        plants = get_cluster_group_centers(merged_clusters_group)
+        plant_ids = ScanStore().set_plants(plants, scan.scan_id, [len(group) for group in merged_clusters_group])
 
-    # cg short for clusters group
-    plant_images = []
-    for cg_x, cg_y in plants:
-        motor.goto(cg_x, cg_y, motor.current_z)
-        time.sleep(7)
-        goto_plant_center(cam, motor, flask_state)
-        # take a photo!
-        if not cam.isOpened():
-            raise IOError("Cannot open webcam")
-        ret, frame = cam.read()
-        if not ret:
-            logger.warning(f"Failed to capture at ({cg_x}, {cg_y})")
-            continue
-        plant_images.append(frame)
-    manager.sunlight_actuator.stop_light()
+        plant_images, plant_boxes = photograph_plants(cam, motor, flask_state, plant_ids, plants)
+    finally:
+        manager.sunlight_actuator.apply_schedule()
+    report_progress(0.9, "Asking the agents for care requirements")
 
-    # Combine the images into one
+    # Tile the photos for the dashboard only; each plant is recognized from its own photo
     if plant_images:
-        plant_images = combine_image(plant_images)
-        flask_state['yolo_frame'] = plant_images
-
-    result = recognition_agent.regocnize_plant(plant_images)
-    logger.info(f"Plant: {result.plant_name}, {result.growth_stage}")
-    plant_requirements = requirements_agent.get_requirements(result.plant_name, result.growth_stage, result.details, plant_images)
+        flask_state['yolo_frame'] = combine_image(list(plant_images.values()))
+
+    results = {n: r for n, r in recognition_agent.recognize_plants(plant_images, plant_boxes).items() if r is not None}
+    status_store.set('recognition', {str(n): r.model_dump() for n, r in results.items()})
+    if not results:
+        logger.error("No plant could be recognized; keeping the current settings")
+        return
+    n, result, count = majority_plant(results)
+    logger.info(f"Plant: {result.plant_name}, {result.growth_stage} ({count}/{len(results)} plants)")
+    plant_requirements = requirements_agent.get_requirements(result.plant_name, result.growth_stage, result.details,
+                                                             crop_to_box(plant_images[n], plant_boxes.get(n)))
     logger.info(f"Requirements: {plant_requirements}")
+    if plant_requirements.plant_name:  # not the placeholder returned when the model gave no answer
+        # The first job compares against these photos instead of asking the agents again
+        ChangeGate().accept({n: color_descriptor(frame, plant_boxes.get(n)) for n, frame in plant_images.items()},
+                            plant_requirements.model_dump())
 
     try:
         manager.update(plant_requirements)
@@ -105,88 +86,73 @@ def init_plant_scan(cam: cv2.VideoCapture, motor: MotorContol.MotorControl, flas
     except ValueError as e:
         logger.error(f"Failed to update actuator settings due to invalid requirements: {e}")
 
-    flask_state['job_status'] = 'stopped'
-    socketio.emit('job_status', {'status': 'stopped'})
+    Checkpointer().save()
     logger.info("Init plant scan completed")
 
 
-def detect_and_save_plant(camera, x, y):
-    if not camera.isOpened():
-        raise IOError("Cannot open webcam")
-    ret, frame = camera.read()
-
-    if not ret:
-        logger.warning(f"Failed to capture at ({x}, {y})")
-        return None
-
-    model = get_model()
-    results = model(frame)
-    annotated_frame = results[0].plot()
-
-    plant_boxes = [box.xyxy[0].tolist() for box in results[0].boxes if int(box.cls[0]) == 0]
-
-    for box in plant_boxes:
-        GlobalState().scan_data.append({
-            'motor_position': (x, y),
-            'bbox': box,
-            'detections': results[0].boxes.data.tolist()
-        })
+def scan_grid(cam, motor: MotorContol.MotorControl, flask_state, scan: ScanWriter):
+    """Zig-zag over the whole bed, recording detections into `scan`."""
+    step_x, step_y = 3, 1.5
+    x_positions = [i * step_x for i in range(int(9.5 / step_x) + 1)]
+    y_positions = [j * step_y for j in range(int(9.0 / step_y) + 1)]
+    cells = len(x_positions) * len(y_positions)
 
-    return annotated_frame
+    visited = 0
+    for i, x in enumerate(x_positions):  # zig-zag pattern
+        y_range = reversed(y_positions) if i % 2 else y_positions
+        job_sleep(1)
 
+        for y in y_range:
+            check_cancelled()
 
-def goto_plant_center(camera, motor: MotorContol.MotorControl, flask_state):
-    step_size = 0.15  # Small incremental movement
-    model = get_model()
-    for _ in range(20):
-        if not camera.isOpened():
-            raise IOError("Cannot open webcam")
-        ret, frame = camera.read()
+            motor.move_to(x, y, 0)
+            job_sleep(1)
+            logger.debug(f"Moved to ({x}, {y})")
+            visited += 1
+            report_progress(0.6 * visited / cells, f"Scanning ({x}, {y})")
 
-        if not ret:
-            logger.warning(f"Failed to capture at ({motor.current_x}, {motor.current_y})")
-            continue
+            annotated_frame = detect_and_save_plant(cam, x, y, scan)
+            if annotated_frame is not None:
+                flask_state['yolo_frame'] = annotated_frame
+            else:
+                continue
 
-        results = model(frame)
-        annotated_frame = results[0].plot()
-        flask_state['yolo_frame'] = annotated_frame
 
-        plant_boxes = [box.xyxy[0].tolist() for box in results[0].boxes if int(box.cls[0]) == 0]
-        if not plant_boxes:
-            logger.warning("No plant detected")
+def photograph_plants(cam, motor: MotorContol.MotorControl, flask_state, plant_ids, plants):
+    """Center on each plant and take a photo of it. Returns ({plant id: photo}, {plant id: box of the plant in it})."""
+    # cg short for clusters group
+    plant_images = {}
+    plant_boxes = {}
+    for i, (plant_id, (cg_x, cg_y)) in enumerate(zip(plant_ids, plants)):
+        report_progress(0.6 + 0.3 * i / len(plants), f"Photographing plant {i + 1}/{len(plants)}")
+        motor.goto(cg_x, cg_y, motor.current_z)
+        job_sleep(7)
+        frame, plant_box = photograph_plant(cam, motor, flask_state)
+        if frame is None:
+            logger.warning(f"Failed to capture at ({cg_x}, {cg_y})")
             continue
-        x1, y1, x2, y2 = plant_boxes[0]
-        leaf_top_x = (x1 + x2) / 2
-        leaf_top_y = (y1 + y2) / 2
-
-        frame_h, frame_w = frame.shape[:2]
-        center_x, center_y = frame_w / 2, frame_h / 2
+        plant_images[plant_id] = frame
+        if plant_box is not None:
+            plant_boxes[plant_id] = plant_box
+    return plant_images, plant_boxes
 
-        # Calculate distance for each axis
-        distance_x = abs(leaf_top_x - center_x)
-        distance_y = abs(leaf_top_y - center_y)
 
-        logger.debug(f"Distance from center: x={distance_x:.2f}, y={distance_y:.2f} pixels")
-
-        if distance_x < 20 and distance_y < 20:
-            logger.info("Leaf centered")
-            break
+def detect_and_save_plant(camera, x, y, scan: ScanWriter):
+    if not camera.isOpened():
+        raise IOError("Cannot open webcam")
+    slot = camera_hub.capture(camera)
 
-        # Move incrementally towards leaf
-        current_motor_x, current_motor_y = motor.get_position()[:2]
+    if slot is None:
+        logger.warning(f"Failed to capture at ({x}, {y})")
+        return None
 
-        motor_x = current_motor_x if distance_y < 10 else current_motor_x + (
-            -step_size if leaf_top_y < center_y else step_size)
-        motor_y = current_motor_y if distance_x < 10 else current_motor_y + (
-            -step_size if leaf_top_x < center_x else step_size)
+    with slot:
+        detections = detect(slot, 'leaf')
+        annotated_frame = annotate(slot.array, detections)
 
-        motor_x = max(0, min(9.5, motor_x))
-        motor_y = max(0, min(9.0, motor_y))
+    scan.add((x, y), detections.boxes)
 
-        logger.info(
-            f"Leaf at ({leaf_top_x:.0f}, {leaf_top_y:.0f}), center ({center_x:.0f}, {center_y:.0f}), moving to ({motor_x:.2f}, {motor_y:.2f})")
-        motor.goto(motor_x, motor_y, 0)
-        time.sleep(2)
+    return annotated_frame
 
 
 def get_cluster_group_centers(merged_clusters):
@@ -200,7 +166,7 @@ def get_cluster_group_centers(merged_clusters):
     return centers
 
 
-def visualize_cluster_group(merged_clusters, camera_fov_x: float = 1.7, camera_fov_y: float = 1.7):
+def visualize_cluster_group(merged_clusters, scan_records, camera_fov_x: float = 1.7, camera_fov_y: float = 1.7):
     # Create visualization canvas
     scale = 60
     camera_fov_x = camera_fov_x * 2
@@ -220,7 +186,7 @@ def visualize_cluster_group(merged_clusters, camera_fov_x: float = 1.7, camera_f
     cv2.rectangle(canvas, (edge_x1, edge_y1), (edge_x2, edge_y2), (255, 255, 255), 2)
 
     # Draw all detections first (gray)
-    for scan in GlobalState().scan_data:
+    for scan in scan_records:
         motor_y, motor_x = scan['motor_position']
         if 'detections' in scan:
             for det in scan['detections']:
@@ -1,6 +1,6 @@
 import math
-import os
 import time
+from collections import Counter
 
 import cv2
 import numpy as np
@@ -8,54 +8,83 @@ from loguru import logger
 
 import MotorContol
 from Agent import PlantRequirements, PlantRecognition
-from Common import GlobalState
+from Agent.payload import crop_to_box
+from Common.change_gate import ChangeGate
+from Common import status_store
+from Common.checkpoint import Checkpointer
+from Common.image_archive import ImageArchive
+from Common.image_descriptors import color_descriptor
+from Common.job_runner import check_cancelled, job_sleep, report_progress
+from Common.plant_history import PlantHistory
+from Common.scan_store import ScanStore
 from EnvActuator import ActuatorManager
-from Yolo import get_model
+from .centering import photograph_plant
 
 
 def job(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, env_manager: ActuatorManager, flask_state: dict,
         recognition_agent: PlantRecognition.PlantRecognitionAgent,
-        requirements_agent: PlantRequirements.PlantRequirementsAgent, socketio):
-    plants_cord = GlobalState().scan_data
+        requirements_agent: PlantRequirements.PlantRequirementsAgent):
+    plants = ScanStore().plant_sites()
 
-    env_manager.sunlight_actuator.provide_light(2)
-
-    # Make dir Images/{time}
+    # Photos of this run go to Images/{time}
     now = time.strftime("%Y%m%d-%H%M%S")
-    save_dir = f"Images/{now}"
-    os.makedirs(save_dir, exist_ok=True)
-
-    plant_images = []
-    i = 0
-    for plant_x, plant_y in plants_cord:
-        motor.goto(plant_x, plant_y, motor.current_z)
-        time.sleep(7)
-        goto_plant_center(camera, motor, flask_state)
-        # take a photo!
-        if not camera.isOpened():
-            raise IOError("Cannot open webcam")
-        ret, frame = camera.read()
-        if not ret:
-            logger.warning(f"Failed to capture at ({plant_x}, {plant_y})")
-            continue
-        plant_images.append(frame)
-
-        # save the image in Images/time/plant_i.jpg
-        cv2.imwrite(f"{save_dir}/plant_{i}.jpg", frame)
-        i += 1
-
-    env_manager.sunlight_actuator.stop_light()
-
-    # Combine the images into one
-    if plant_images:
-        plant_images = combine_image(plant_images)
-        flask_state['yolo_frame'] = plant_images
 
-    result = recognition_agent.regocnize_plant(plant_images)
-    logger.info(f"Plant: {result.plant_name}, {result.growth_stage}")
-    plant_requirements = requirements_agent.get_requirements(result.plant_name, result.growth_stage, result.details,
-                                                             plant_images)
-    logger.info(f"Requirements: {plant_requirements}")
+    env_manager.sunlight_actuator.provide_light(2)
+    try:
+        # Keyed by the plant's stable id, so history, photos and the change gate follow the plant across re-scans
+        plant_images = {}  # plant id -> photo
+        plant_boxes = {}  # plant id -> box of the plant in its photo
+        descriptors = {}
+        i = 0
+        for n, (plant_id, plant_x, plant_y) in enumerate(plants):
+            check_cancelled()
+            report_progress(0.9 * n / len(plants), f"Photographing plant {n + 1}/{len(plants)}")
+            motor.goto(plant_x, plant_y, motor.current_z)
+            job_sleep(7)
+            frame, plant_box = photograph_plant(camera, motor, flask_state)
+            if frame is None:
+                logger.warning(f"Failed to capture at ({plant_x}, {plant_y})")
+                continue
+            plant_images[plant_id] = frame
+            if plant_box is not None:
+                plant_boxes[plant_id] = plant_box
+                # Without a box the metrics would cover the whole frame, not the plant
+                PlantHistory().record(plant_id, frame, plant_box)
+            descriptors[plant_id] = color_descriptor(frame, plant_box)
+
+            # save the image in Images/time/plant_i.jpg, off the motion loop
+            ImageArchive().submit(frame, now, f"plant_{i}", plant_id=plant_id, position=(plant_x, plant_y))
+            i += 1
+    finally:
+        env_manager.sunlight_actuator.apply_schedule()
+    report_progress(0.9, "Asking the agents for care requirements")
+
+    # Tile the photos for the dashboard only; each plant is recognized from its own photo
+    if plant_images:
+        flask_state['yolo_frame'] = combine_image(list(plant_images.values()))
+
+    # Only ask the agents again when the plants look different from the last time they were asked
+    gate = ChangeGate()
+    if gate.changed(descriptors):
+        results = {n: r for n, r in recognition_agent.recognize_plants(plant_images, plant_boxes).items() if r is not None}
+        status_store.set('recognition', {str(n): r.model_dump() for n, r in results.items()})
+        if not results:
+            logger.error("No plant could be recognized; keeping the current settings")
+            return
+        n, result, count = majority_plant(results)
+        logger.info(f"Plant: {result.plant_name}, {result.growth_stage} ({count}/{len(results)} plants)")
+        plant_requirements = requirements_agent.get_requirements(result.plant_name, result.growth_stage,
+                                                                 result.details,
+                                                                 crop_to_box(plant_images[n], plant_boxes.get(n)))
+        logger.info(f"Requirements: {plant_requirements}")
+        status_store.set('agent_cache', {'recognition': recognition_agent.cache.stats(),
+                                         'requirements': requirements_agent.cache.stats()})
+        status_store.set('agent_payload', {'recognition': recognition_agent.payload.stats(),
+                                           'requirements': requirements_agent.payload.stats()})
+        if plant_requirements.plant_name:  # not the placeholder returned when the model gave no answer
+            gate.accept(descriptors, plant_requirements.model_dump())
+    else:
+        plant_requirements = PlantRequirements.PlantRequirementsResult(**gate.result)
 
     try:
         env_manager.update(plant_requirements)
@@ -72,63 +101,22 @@ def job(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, env_manager:
     except ValueError as e:
         logger.error(f"Failed to update actuator settings due to invalid requirements: {e}")
 
-    flask_state['job_status'] = 'stopped'
-    socketio.emit('job_status', {'status': 'stopped'})
+    Checkpointer().save()
     logger.info("Job completed")
 
 
-def goto_plant_center(camera, motor: MotorContol.MotorControl, flask_state):
-    step_size = 0.15  # Small incremental movement
-    model = get_model()
-    for _ in range(20):
-        if not camera.isOpened():
-            raise IOError("Cannot open webcam")
-        ret, frame = camera.read()
-
-        if not ret:
-            logger.warning(f"Failed to capture at ({motor.current_x}, {motor.current_y})")
-            continue
-
-        results = model(frame)
-        annotated_frame = results[0].plot()
-        flask_state['yolo_frame'] = annotated_frame
-
-        plant_boxes = [box.xyxy[0].tolist() for box in results[0].boxes if int(box.cls[0]) == 0]
-        if not plant_boxes:
-            logger.warning("No plant detected")
-            continue
-        x1, y1, x2, y2 = plant_boxes[0]
-        leaf_top_x = (x1 + x2) / 2
-        leaf_top_y = (y1 + y2) / 2
-
-        frame_h, frame_w = frame.shape[:2]
-        center_x, center_y = frame_w / 2, frame_h / 2
-
-        # Calculate distance for each axis
-        distance_x = abs(leaf_top_x - center_x)
-        distance_y = abs(leaf_top_y - center_y)
-
-        logger.debug(f"Distance from center: x={distance_x:.2f}, y={distance_y:.2f} pixels")
-
-        if distance_x < 20 and distance_y < 20:
-            logger.info("Leaf centered")
-            break
-
-        # Move incrementally towards leaf
-        current_motor_x, current_motor_y = motor.get_position()[:2]
-
-        motor_x = current_motor_x if distance_y < 10 else current_motor_x + (
-            -step_size if leaf_top_y < center_y else step_size)
-        motor_y = current_motor_y if distance_x < 10 else current_motor_y + (
-            -step_size if leaf_top_x < center_x else step_size)
+def plant_identity(result: PlantRecognition.PlantRecognitionResult) -> tuple[str, str]:
+    return (PlantRequirements.normalize_key(result.plant_name),
+            PlantRequirements.normalize_key(result.growth_stage))
 
-        motor_x = max(0, min(9.5, motor_x))
-        motor_y = max(0, min(9.0, motor_y))
 
-        logger.info(
-            f"Leaf at ({leaf_top_x:.0f}, {leaf_top_y:.0f}), center ({center_x:.0f}, {center_y:.0f}), moving to ({motor_x:.2f}, {motor_y:.2f})")
-        motor.goto(motor_x, motor_y, 0)
-        time.sleep(2)
+def majority_plant(results: dict) -> tuple[int, PlantRecognition.PlantRecognitionResult, int]:
+    """(plant id, result, votes) of the most common plant and stage among `results` {plant id: result}.
+    The bed shares one environment, so requirements are planned for that plant."""
+    votes = Counter(map(plant_identity, results.values()))
+    majority, count = votes.most_common(1)[0]
+    n = next(n for n, r in results.items() if plant_identity(r) == majority)
+    return n, results[n], count
 
 
 def combine_image(images):
@@ -1,17 +1,14 @@
-import os
-import time
-
 import cv2
-from ultralytics import YOLO
 
 import MotorContol
 from Agent import PlantRequirements, PlantRecognition
 from Common import GlobalState
 from EnvActuator import ActuatorManager
+from Common.frame_hub import camera_hub, yolo_hub
+from Common.job_runner import check_cancelled, job_sleep
+from Yolo import Detections, annotate, detect
 from loguru import logger
 
-_tomato_model = None
-
 TOMATO_CLASSES = {
     0: 'b_fully_ripened',
     1: 'b_green',
@@ -25,47 +22,31 @@ TOMATO_CLASSES = {
 TOMATO_CLASS_IDS = {i for i, name in TOMATO_CLASSES.items() if name != 'leaf'}
 
 
-def get_tomato_model():
-    global _tomato_model
-    if _tomato_model is None:
-        model_path = os.path.join(os.path.dirname(__file__), '..', 'Yolo', 'tomato.pt')
-        _tomato_model = YOLO(model_path)
-    return _tomato_model
-
-
-def detect_tomato(camera: cv2.VideoCapture):
-    ret, frame = camera.read()
-    if not ret:
-        logger.warning("Failed to read frame from camera")
-        return None, []
-
-    model = get_tomato_model()
-    results = model(frame)
-
-    boxes = results[0].boxes
-    if boxes is None or len(boxes) == 0:
-        return None, []
-
-    # Check if any detected object is a tomato (not leaf)
+def tomato_boxes_of(detections: Detections):
+    """Tomato (not leaf) detections as dicts with their box and center."""
     tomato_boxes = []
-    for box in boxes:
-        cls_id = int(box.cls[0])
-        if cls_id not in TOMATO_CLASS_IDS:
-            continue
-        x1, y1, x2, y2 = box.xyxy[0].tolist()
-        cx = (x1 + x2) / 2
-        cy = (y1 + y2) / 2
-        conf = float(box.conf[0])
+    for x1, y1, x2, y2, conf, cls_id in detections.of_class(*TOMATO_CLASS_IDS).boxes.tolist():
         tomato_boxes.append({
-            'cx': cx, 'cy': cy,
+            'cx': (x1 + x2) / 2, 'cy': (y1 + y2) / 2,
             'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
-            'cls': cls_id, 'conf': conf,
+            'cls': int(cls_id), 'conf': conf,
         })
+    return tomato_boxes
+
 
-    if not tomato_boxes:
+def detect_tomato(camera: cv2.VideoCapture):
+    slot = camera_hub.capture(camera)
+    if slot is None:
+        logger.warning("Failed to read frame from camera")
         return None, []
 
-    annotated_frame = results[0].plot()
+    with slot:
+        detections = detect(slot, 'tomato')
+        tomato_boxes = tomato_boxes_of(detections)
+        if not tomato_boxes:
+            return None, []
+
+        annotated_frame = annotate(slot.array, detections)
     return annotated_frame, tomato_boxes
 
 
@@ -77,43 +58,33 @@ def select_closest_to_top_left(tomato_boxes):
 def goto_tomato_center(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, flask_state: dict):
     """Move the motor so the closest tomato is centered in the camera frame.
 
-    Follows the same pixel-to-motor-axis mapping as goto_plant_center in job.py:
+    Follows the same pixel-to-motor-axis mapping as goto_plant_center in centering.py:
     pixel_y -> motor_x, pixel_x -> motor_y.
     """
     max_step = 0.5
     min_step = 0.08
-    model = get_tomato_model()
 
     for iteration in range(20):
         if not camera.isOpened():
             raise IOError("Cannot open webcam")
-        ret, frame = camera.read()
-        if not ret:
+        slot = camera_hub.capture(camera)
+        if slot is None:
             logger.warning(f"Failed to capture at ({motor.current_x}, {motor.current_y})")
             continue
 
-        results = model(frame)
-        annotated_frame = results[0].plot()
-        flask_state['yolo_frame'] = annotated_frame
+        with slot:
+            detections = detect(slot, 'tomato')
+            with yolo_hub.write(slot.array.shape) as annotated_frame:
+                annotate(slot.array, detections, annotated_frame)
+            frame_h, frame_w = slot.array.shape[:2]
 
         # Collect tomato boxes from detection
-        tomato_boxes = []
-        if results[0].boxes is not None:
-            for box in results[0].boxes:
-                cls_id = int(box.cls[0])
-                if cls_id not in TOMATO_CLASS_IDS:
-                    continue
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                tomato_boxes.append({
-                    'cx': (x1 + x2) / 2,
-                    'cy': (y1 + y2) / 2,
-                })
+        tomato_boxes = tomato_boxes_of(detections)
 
         if not tomato_boxes:
             logger.warning("No tomato detected during centering")
             continue
 
-        frame_h, frame_w = frame.shape[:2]
         # center_x, center_y = frame_w / 2, frame_h / 2
 
         center_x = frame_w / 2
@@ -153,7 +124,7 @@ def goto_tomato_center(camera: cv2.VideoCapture, motor: MotorContol.MotorControl
             f"Tomato at ({tomato_px:.0f}, {tomato_py:.0f}), center ({center_x:.0f}, {center_y:.0f}), "
             f"step={step_size:.2f}, moving to ({motor_x:.2f}, {motor_y:.2f})")
         motor.goto(motor_x, motor_y, 0)
-        time.sleep(2)
+        job_sleep(2)
 
     logger.warning("Failed to center tomato after 20 iterations")
     return False
@@ -164,59 +135,44 @@ def pick_tomato(motor: MotorContol.MotorControl):
     cur_x, cur_y = motor.get_position()[:2]
 
     motor.open_claw()
-    time.sleep(1)
+    job_sleep(1)
     target_x = max(0, min(9.5, cur_x + 0.5)) 
 
     # print("开始执行移动爪子")
     motor.goto(target_x, cur_y+0.3, 1.3)
-    time.sleep(3)
+    job_sleep(3)
     # print("执行完成移动爪子")
 
     motor.close_claw()
-    time.sleep(1)
+    job_sleep(1)
 
     motor.goto(cur_x, cur_y, 0)
-    time.sleep(2)
+    job_sleep(2)
 
     motor.goto(0, 0, 0)
-    time.sleep(3)
+    job_sleep(3)
 
     motor.open_claw()
-    time.sleep(1)
+    job_sleep(1)
 
     logger.info("Pick-and-place sequence completed")
 
 
-def pick(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, env_manager: ActuatorManager, flask_state: dict,
-        recognition_agent: PlantRecognition.PlantRecognitionAgent,
-        requirements_agent: PlantRequirements.PlantRequirementsAgent, socketio):
-    motor.goto(0, 0, 0)
-    motor.set_servo_angles(servo_1=0, servo_2=90, servo_3=0)
-    time.sleep(5)
-    env_manager.sunlight_actuator.provide_light(2)
-
+def scan_and_pick(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, flask_state: dict) -> bool:
+    """Zig-zag over the bed and pick the first tomato that can be centered. Returns True if one was picked."""
     step_x, step_y = 3, 1.5
     x_positions = [i * step_x for i in range(int(9.5 / step_x) + 1)]
     y_positions = [j * step_y for j in range(int(9.0 / step_y) + 1)]
 
-    # Clear previous YOLO frame and scan data
-    flask_state['yolo_frame'] = None
-
     for i, x in enumerate(x_positions):  # zig-zag pattern
         y_range = reversed(y_positions) if i % 2 else y_positions
-        time.sleep(1)
+        job_sleep(1)
 
         for y in y_range:
-            # Check for stop signal
-            if flask_state['job_control']['should_stop']:
-                logger.info("Job stopped by user")
-                env_manager.sunlight_actuator.stop_light()
-                flask_state['job_status'] = 'stopped'
-                socketio.emit('job_status', {'status': 'stopped'})
-                return
+            check_cancelled()
 
             motor.move_to(x, y, 0)
-            time.sleep(1)
+            job_sleep(1)
             logger.debug(f"Moved to ({x}, {y})")
 
             annotated_frame, tomato_boxes = detect_tomato(camera)
@@ -241,16 +197,27 @@ def pick(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, env_manager:
 
             # Execute pick-and-place
             pick_tomato(motor)
+            return True
+
+    return False
 
-            # Done – picked one tomato, finish the job
-            env_manager.sunlight_actuator.stop_light()
-            flask_state['job_status'] = 'stopped'
-            socketio.emit('job_status', {'status': 'stopped'})
-            logger.info("Pick job completed – tomato picked")
-            return
 
-    # Scan finished without finding / picking any tomato
-    env_manager.sunlight_actuator.stop_light()
-    flask_state['job_status'] = 'stopped'
-    socketio.emit('job_status', {'status': 'stopped'})
-    logger.info("Pick job completed – no tomato found")
+def pick(camera: cv2.VideoCapture, motor: MotorContol.MotorControl, env_manager: ActuatorManager, flask_state: dict,
+        recognition_agent: PlantRecognition.PlantRecognitionAgent,
+        requirements_agent: PlantRequirements.PlantRequirementsAgent):
+    motor.goto(0, 0, 0)
+    motor.set_servo_angles(servo_1=0, servo_2=90, servo_3=0)
+    job_sleep(5)
+
+    # Clear previous YOLO frame and scan data
+    flask_state['yolo_frame'] = None
+
+    env_manager.sunlight_actuator.provide_light(2)
+    try:
+        if scan_and_pick(camera, motor, flask_state):
+            logger.info("Pick job completed – tomato picked")
+        else:
+            logger.info("Pick job completed – no tomato found")
+    finally:
+        # Also turn the light off when the job is cancelled
+        env_manager.sunlight_actuator.apply_schedule()
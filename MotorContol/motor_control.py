@@ -1,4 +1,4 @@
-from Common import Singleton, PlantBoxSerial
+from Common import Singleton, PlantBoxSerial, status_store
 
 class MotorControl(metaclass=Singleton):
     CLAW_OPEN_ANGLE = 0.0
@@ -16,6 +16,7 @@ class MotorControl(metaclass=Singleton):
         self.servo_2_offset = servo_2_offset
         self.servo_3_offset = servo_3_offset
         self.ser = plant_box_serial
+        self.publish_state()
 
     def move_to(self, x: float, y: float, z: float):
         if not (0 <= x <= 9.5):
@@ -32,6 +33,7 @@ class MotorControl(metaclass=Singleton):
         self.current_x = x
         self.current_y = y
         self.current_z = z
+        self.publish_state()
 
     def goto(self, x: float, y: float, z: float):
         """Alias for move_to."""
@@ -83,10 +85,26 @@ class MotorControl(metaclass=Singleton):
         self.current_servo_1 = s1
         self.current_servo_2 = s2
         self.current_servo_3 = s3
+        self.publish_state()
 
     def get_position(self):
         return self.current_x, self.current_y, self.current_z
 
+    def as_dict(self):
+        return {
+            'x': self.current_x,
+            'y': self.current_y,
+            'z': self.current_z,
+            'servo_1': self.current_servo_1,
+            'servo_2': self.current_servo_2,
+            'servo_3': self.current_servo_3,
+            'claw': self.current_claw
+        }
+
+    def publish_state(self):
+        """Push the current pose to the dashboard state store."""
+        status_store.set('motor', self.as_dict())
+
     def set_claw(self, angle: float):
         """设置机械爪角度，0°张开，60°闭合。"""
         if not (self.CLAW_OPEN_ANGLE <= angle <= self.CLAW_CLOSE_ANGLE):
@@ -94,6 +112,7 @@ class MotorControl(metaclass=Singleton):
         self.current_claw = angle
         command = f"{self.current_x},{self.current_y},{self.current_z},{self.current_servo_1},{self.current_servo_2},{self.current_servo_3},{self.current_claw}\n"
         self.ser.write(command.encode())
+        self.publish_state()
 
     def open_claw(self):
         """机械爪完全张开（0°）。"""
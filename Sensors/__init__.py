@@ -1,2 +1,3 @@
 from .packed_sensor_input import *
-from .temperature_sensor import *
\ No newline at end of file
+from .temperature_sensor import *
+from .sensor_stream import *
@@ -1,6 +1,8 @@
+from .sensor_stream import SensorStream
+
+
 def get_packed_sensor_input() -> tuple[float, ...]:
     """Get packed sensor input from all sensors."""
-    # temp,humidity,soil humidity
-    data = "23,70,50"
-    data = map(float, data.split(","))
-    return tuple(data)
\ No newline at end of file
+    # temp,humidity,soil humidity; 0 until the firmware has reported a channel
+    data = SensorStream().snapshot(default=0.0)
+    return data['temperature'], data['humidity'], data['soil_humidity']
@@ -0,0 +1,173 @@
+import re
+import time
+from threading import Condition
+from typing import NamedTuple
+
+import numpy as np
+from loguru import logger
+
+from Common import Singleton
+
+__all__ = ['SensorSample', 'SensorChannel', 'SensorStream', 'CHANNELS']
+
+# Channels the firmware reports, in the order of get_packed_sensor_input()
+CHANNELS = ('temperature', 'humidity', 'soil_humidity')
+
+# Firmware labels, checked in order so the longest label wins ("土壤湿度" before "湿度")
+_LABELS = (
+    ('土壤湿度', 'soil_humidity'),
+    ('湿度', 'humidity'),
+    ('温度', 'temperature'),
+)
+
+# ASCII keys accepted in "key:value" / "key=value" telemetry: only the full channel names,
+# so other key:value output on the port (firmware status, debug prints) is not taken for a reading
+_KEYS = frozenset(CHANNELS)
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_KEY_VALUE = re.compile(r'([A-Za-z_]+)\s*[:=]\s*(-?\d+(?:\.\d+)?)')
+
+
+def _mojibake(label: str) -> str:
+    """The label as it shows up when UTF-8 firmware output is read back as GBK (e.g. 婀垮害 for 湿度)."""
+    return label.encode('utf-8').decode('gbk', errors='ignore')
+
+
+_PREFIXES = tuple((prefix, channel) for label, channel in _LABELS for prefix in (label, _mojibake(label)))
+
+
+class SensorSample(NamedTuple):
+    channel: str
+    value: float
+    timestamp: float
+
+
+class SensorChannel:
+    """Fixed-size ring buffer of (timestamp, value) samples for one sensor."""
+
+    def __init__(self, name: str, capacity: int = 1024):
+        self.name = name
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # next slot to write
+        self._count = 0
+        self._cond = Condition()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value: float, timestamp: float = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            self._timestamps[self._head] = timestamp
+            self._values[self._head] = value
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._cond.notify_all()
+
+    def latest(self) -> SensorSample | None:
+        with self._cond:
+            if not self._count:
+                return None
+            i = self._head - 1
+            return SensorSample(self.name, float(self._values[i]), float(self._timestamps[i]))
+
+    def window(self, seconds: float = None, count: int = None, since: float = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (timestamps, values) in chronological order, optionally limited to the
+        last `seconds`, the last `count` samples and/or samples newer than `since`."""
+        with self._cond:
+            n = self._count if count is None else min(count, self._count)
+            start = (self._head - n) % self.capacity
+            if start + n <= self.capacity:
+                ts = self._timestamps[start:start + n].copy()
+                values = self._values[start:start + n].copy()
+            else:
+                ts = np.concatenate((self._timestamps[start:], self._timestamps[:self._head]))
+                values = np.concatenate((self._values[start:], self._values[:self._head]))
+
+        # Timestamps are monotonic, so the cutoffs are a binary search rather than a mask
+        first = 0
+        if seconds is not None:
+            first = max(first, int(np.searchsorted(ts, time.time() - seconds, side='left')))
+        if since is not None:
+            first = max(first, int(np.searchsorted(ts, since, side='right')))
+        return ts[first:], values[first:]
+
+    def median(self, seconds: float = None, count: int = None, since: float = None) -> float | None:
+        values = self.window(seconds, count, since)[1]
+        return float(np.median(values)) if values.size else None
+
+    def mean(self, seconds: float = None, count: int = None, since: float = None) -> float | None:
+        values = self.window(seconds, count, since)[1]
+        return float(values.mean()) if values.size else None
+
+    def trimmed_mean(self, seconds: float = None, count: int = None, since: float = None, trim: int = 1) -> float | None:
+        """Mean after dropping the `trim` highest and lowest samples."""
+        values = self.window(seconds, count, since)[1]
+        if values.size <= 2 * trim:
+            return float(values.mean()) if values.size else None
+        values = np.partition(values, (trim, values.size - trim - 1))
+        return float(values[trim:values.size - trim].mean())
+
+    def wait_for(self, count: int, since: float, timeout: float = None) -> bool:
+        """Block until at least `count` samples newer than `since` are buffered."""
+        def ready():
+            return self.window(count=count, since=since)[1].size >= count
+
+        with self._cond:
+            return self._cond.wait_for(ready, timeout)
+
+
+class SensorStream(metaclass=Singleton):
+    """Parses telemetry lines from PlantBoxSerial into per-channel ring buffers."""
+
+    def __init__(self, capacity: int = 1024):
+        self.channels = {name: SensorChannel(name, capacity) for name in CHANNELS}
+        self.listeners = []
+
+    def channel(self, name: str) -> SensorChannel:
+        return self.channels[name]
+
+    @staticmethod
+    def parse_line(line: str, timestamp: float = None) -> list[SensorSample]:
+        """Parse one serial line into samples. Lines that are not telemetry yield nothing."""
+        timestamp = time.time() if timestamp is None else timestamp
+        line = line.strip()
+
+        for prefix, channel in _PREFIXES:
+            if line.startswith(prefix):
+                match = _NUMBER.search(line, len(prefix))
+                if match is None:
+                    return []
+                return [SensorSample(channel, float(match.group()), timestamp)]
+
+        samples = []
+        for key, value in _KEY_VALUE.findall(line):
+            channel = key.lower()
+            if channel in _KEYS:
+                samples.append(SensorSample(channel, float(value), timestamp))
+        return samples
+
+    def add_listener(self, listener):
+        """Call `listener(samples)` whenever a line yields new samples."""
+        self.listeners.append(listener)
+
+    def feed(self, line: str):
+        """Serial listener: store any samples found in `line`."""
+        samples = self.parse_line(line)
+        for sample in samples:
+            self.channels[sample.channel].append(sample.value, sample.timestamp)
+        if samples:
+            logger.trace(f"Sensor samples: {samples}")
+            for listener in self.listeners:
+                listener(samples)
+        return samples
+
+    def latest(self, name: str, default: float = None) -> float | None:
+        sample = self.channels[name].latest()
+        return default if sample is None else sample.value
+
+    def snapshot(self, default: float = 0.0) -> dict[str, float]:
+        """Latest value of every channel, for the dashboard."""
+        return {name: self.latest(name, default) for name in CHANNELS}
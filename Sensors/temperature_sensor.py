@@ -1,4 +1,6 @@
-def get_sensor_temperature() -> float:
-    """Get the current temperature from sensor."""
-    # TODO
-    return 25.0
\ No newline at end of file
+from .sensor_stream import SensorStream
+
+
+def get_sensor_temperature() -> float | None:
+    """Get the latest temperature from sensor, or None if nothing has been reported yet."""
+    return SensorStream().latest('temperature')
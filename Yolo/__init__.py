@@ -1,18 +1,19 @@
-from ultralytics import YOLO
 from Common.dbscan import cluster_boxes_dbscan
+from .inference import Detections, InferenceService, annotate, detect
 
 _model = None
 
 def get_model():
+    """In-process leaf model. Jobs should use detect(), which runs in the inference workers."""
     global _model
     if _model is None:
+        from ultralytics import YOLO
         _model = YOLO("yolo/leaf.pt")
     return _model
 
 def detect_plants(frame):
-    model = get_model()
-    results = model(frame)
-    if results[0].boxes is None or len(results[0].boxes) == 0:
+    detections = detect(frame, 'leaf')
+    if not len(detections):
         return []
-    boxes = [box.tolist() for box in results[0].boxes.xyxy.cpu().numpy()]
+    boxes = detections.xyxy.tolist()
     return cluster_boxes_dbscan(boxes, eps=2000, min_samples=3)
@@ -0,0 +1,223 @@
+"""YOLO inference in worker processes.
+
+Frames go to the workers through shared memory instead of being pickled, and each
+result comes back as one small (N, 6) float32 array of x1, y1, x2, y2, conf, cls rows.
+The models, the torch runtime and all the per-frame work live in the workers, so the
+GIL in the main process stays free for Flask, Socket.IO and the actuator threads.
+"""
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from Common import Singleton
+from Common.frame_bus import FrameSlot, attach
+
+MODELS = {
+    'leaf': 'yolo/leaf.pt',
+    'tomato': os.path.join(os.path.dirname(__file__), 'tomato.pt'),
+}
+
+EMPTY_BOXES = np.zeros((0, 6), dtype=np.float32)
+
+
+class Detections(NamedTuple):
+    boxes: np.ndarray  # (N, 6) float32: x1, y1, x2, y2, conf, cls
+    names: dict  # class id -> name
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.boxes[:, :4]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.boxes[:, 4]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.boxes[:, 5].astype(int)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def of_class(self, *class_ids) -> 'Detections':
+        return Detections(self.boxes[np.isin(self.cls, class_ids)], self.names)
+
+
+def _worker(conn, models: dict):
+    """Worker process loop: attach to the shared frame named in each request (a FrameBus
+    slot or the worker's own buffer), run the model on it in place and send back the box array."""
+    from ultralytics import YOLO
+
+    loaded = {}
+    attached = {}
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            shm_name, offset, shape, dtype, model_name = request
+            frame = None  # drop the previous view so attach() can close evicted segments
+            try:
+                frame = attach(shm_name, offset, shape, dtype, attached)
+                if model_name not in loaded:
+                    loaded[model_name] = YOLO(models[model_name])
+                model = loaded[model_name]
+                result = model(frame, verbose=False)[0]
+                boxes = EMPTY_BOXES if result.boxes is None else result.boxes.data.cpu().numpy().astype(np.float32)
+                conn.send((boxes, result.names, None))
+            except Exception as e:
+                conn.send((None, None, f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+
+class _WorkerLost(Exception):
+    """An inference worker stopped answering and has to be replaced."""
+
+
+class _Worker:
+    """One worker process with its own shared frame buffer, grown on demand."""
+
+    def __init__(self, ctx, models: dict):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker, args=(child_conn, models), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.shm = None
+
+    def detect(self, frame: np.ndarray | FrameSlot, model: str, timeout: float = None):
+        if isinstance(frame, FrameSlot):
+            # Already in shared memory: the worker reads the slot where it is
+            array = frame.array
+            return self._call((frame.shm_name, frame.offset, array.shape, array.dtype.str, model), timeout)
+        if self.shm is None or self.shm.size < frame.nbytes:
+            self.close_buffer()
+            self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf)[...] = frame
+        return self._call((self.shm.name, 0, frame.shape, frame.dtype.str, model), timeout)
+
+    def _call(self, request, timeout: float = None):
+        """Send one request and wait for its reply. Raises _WorkerLost if the pipe breaks,
+        the process is gone or no reply arrives within `timeout`; the worker can't be
+        reused then, since a late reply would be read as the answer to the next request."""
+        try:
+            self.conn.send(request)
+            if not self.conn.poll(timeout):
+                raise _WorkerLost(f"no reply within {timeout}s")
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise _WorkerLost(f"{type(e).__name__}: {e}") from e
+
+    def close_buffer(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.close_buffer()
+
+
+class InferenceService(metaclass=Singleton):
+    """Small pool of YOLO worker processes.
+
+    detect() blocks the calling thread (without holding the GIL) until a worker is
+    free and has run the model. A worker that dies is replaced on the next call.
+    """
+
+    def __init__(self, workers: int = int(os.getenv('PLANTBOX_INFERENCE_WORKERS', '1')), models: dict = None):
+        self.models = dict(MODELS if models is None else models)
+        self._ctx = mp.get_context('spawn')
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            self._spawn()
+        atexit.register(self.close)
+
+    def _spawn(self):
+        worker = _Worker(self._ctx, self.models)
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker: _Worker):
+        with self._lock:
+            self._workers.remove(worker)
+        worker.close()
+
+    def detect(self, frame: np.ndarray | FrameSlot, model: str = 'leaf', timeout: float = None) -> Detections:
+        """Run `model` on a frame. A FrameSlot (held by the caller until this returns)
+        is read in place; a plain array is copied into the worker's buffer first.
+
+        `timeout` bounds both the wait for a free worker and the wait for its reply.
+        Errors on this side (e.g. allocating the shared buffer) leave the worker in the pool.
+        """
+        if model not in self.models:
+            raise KeyError(f"Unknown model: {model}")
+        if not isinstance(frame, FrameSlot):
+            frame = np.ascontiguousarray(frame)
+        worker = self._idle.get(timeout=timeout)
+        lost = False
+        try:
+            boxes, names, error = worker.detect(frame, model, timeout)
+        except _WorkerLost as e:
+            lost = True
+            logger.error(f"Inference worker lost ({e}), restarting it")
+            raise RuntimeError("Inference worker died") from e
+        finally:
+            if lost:
+                self._retire(worker)
+                self._spawn()
+            else:
+                self._idle.put(worker)
+        if error is not None:
+            raise RuntimeError(f"Inference failed: {error}")
+        return Detections(boxes, names)
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+
+def detect(frame: np.ndarray | FrameSlot, model: str = 'leaf') -> Detections:
+    """Run `model` on `frame` in the shared inference pool."""
+    return InferenceService().detect(frame, model)
+
+
+_PALETTE = ((56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72))
+
+
+def annotate(frame: np.ndarray, detections: Detections, out: np.ndarray = None) -> np.ndarray:
+    """Draw boxes and labels onto a copy of `frame` (or into `out`), in place of results.plot()."""
+    if out is None:
+        out = frame.copy()
+    elif out is not frame:
+        out[...] = frame
+    for x1, y1, x2, y2, conf, cls in detections.boxes:
+        color = _PALETTE[int(cls) % len(_PALETTE)]
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(out, p1, p2, color, 2)
+        label = f"{detections.names.get(int(cls), int(cls))} {conf:.2f}"
+        cv2.putText(out, label, (p1[0], max(p1[1] - 4, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return out
@@ -1,92 +1,213 @@
-from flask import Flask, Response, jsonify, request
-from flask_socketio import SocketIO
+from flask import Flask, Response, abort, jsonify, request, send_file
+from flask_socketio import SocketIO, emit
 from flask_cors import CORS
-import cv2
+import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Common import JobRunner, status_store, timers
+from Common.resource_arbiter import PRIORITY_MANUAL, ResourceArbiter
+from Common.scan_store import ScanStore
+from Common.frame_hub import FrameHub, Rendition, camera_hub, yolo_hub
+from Common.image_archive import ImageArchive
+from Common.plant_history import PlantHistory
+from Common.line_batcher import LineBatcher
+from Common.state_store import PublishedDict
+from Sensors import SensorStream
+
+# 'threading' runs the Werkzeug development server with a thread per client. 'gevent' (the
+# `server` extra) serves every MJPEG and Socket.IO client from greenlets in the server thread.
+# The rest of the process is not monkey patched, so camera, serial and inference keep
+# running on real threads; only the server's own background tasks emit to clients.
+ASYNC_MODE = os.getenv('PLANTBOX_ASYNC_MODE', 'threading')
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+
+SERIAL_FLUSH_INTERVAL = 0.1  # seconds between serial output batches
+STATUS_PUSH_INTERVAL = 0.05  # seconds between checks for changed status fields
+serial_batcher = LineBatcher(maxlen=500)
 
-# Shared state
-state = {
+# Shared state; assignments to these keys are published to dashboard clients
+PUBLISHED_KEYS = ('target_env',)
+state = PublishedDict(status_store, PUBLISHED_KEYS, {
     'camera': None,
     'motor': None,
     'yolo_frame': None,
-    'sensor_data': {'temperature': 0, 'humidity': 0, 'soil_humidity': 0},
     'target_env': {},
-    'serial_buffer': [],
-    'job_status': 'stopped',
-    'job_control': {'should_stop': False, 'run_now': False}
-}
+}, hooks={'yolo_frame': yolo_hub.publish})
+status_store.update(motor={}, sensors=SensorStream().snapshot())
+SensorStream().add_listener(lambda samples: status_store.set('sensors', SensorStream().snapshot()))
 
-def generate_camera_stream():
-    """Generate MJPEG stream from camera."""
-    while True:
-        if state['camera'] and state['camera'].isOpened():
-            ret, frame = state['camera'].read()
-            if ret:
-                _, buffer = cv2.imencode('.jpg', frame)
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-        time.sleep(0.033)
-
-def generate_yolo_stream():
-    """Generate MJPEG stream from YOLO output."""
+MANUAL_LEASE = 30.0  # seconds manual control keeps the gantry after the last command
+MANUAL_ACQUIRE_TIMEOUT = 5.0  # seconds to wait for a running job to reach a safe point
+manual_control = {'lease': None, 'pending': None}
+manual_control_lock = threading.Lock()
+manual_acquirer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='manual-lease')
+
+CAMERA_PUMP_IDLE_TIMEOUT = 2.0  # seconds without viewers before the camera pump stops
+camera_pump = {'running': False}
+camera_pump_lock = threading.Lock()
+
+def run_camera_pump():
+    """Read the camera on a real thread while anyone is watching, so stream handlers never block on capture."""
+    last_viewed = time.monotonic()
     while True:
-        if state['yolo_frame'] is not None:
-            _, buffer = cv2.imencode('.jpg', state['yolo_frame'])
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-        time.sleep(0.033)
+        if camera_hub.clients:
+            last_viewed = time.monotonic()
+        elif time.monotonic() - last_viewed > CAMERA_PUMP_IDLE_TIMEOUT:
+            with camera_pump_lock:
+                camera_pump['running'] = False
+            return
+        camera = state['camera']
+        if camera and camera.isOpened():
+            slot = camera_hub.capture(camera)
+            if slot is not None:
+                slot.release()
+        else:
+            time.sleep(0.1)
+
+def ensure_camera_pump():
+    with camera_pump_lock:
+        if not camera_pump['running']:
+            camera_pump['running'] = True
+            threading.Thread(target=run_camera_pump, daemon=True).start()
+
+def generate_mjpeg(hub: FrameHub, remote: str, rendition: Rendition, max_fps: float):
+    """Generate an MJPEG stream that always sends the newest frame once the client is ready for it."""
+    for data in hub.stream(remote, rendition, max_fps, sleep=socketio.sleep):
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+
+def mjpeg_response(hub: FrameHub):
+    """Stream `hub` using the optional ?width=&quality=&max_fps= query parameters."""
+    rendition = Rendition.from_request(request.args.get('width', type=int), request.args.get('quality', type=int))
+    max_fps = max(0.0, request.args.get('max_fps', 0, type=float))
+    return Response(generate_mjpeg(hub, request.remote_addr, rendition, max_fps),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/api/camera/stream')
 def camera_stream():
-    return Response(generate_camera_stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    ensure_camera_pump()
+    return mjpeg_response(camera_hub)
 
 @app.route('/api/yolo/stream')
 def yolo_stream():
-    return Response(generate_yolo_stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return mjpeg_response(yolo_hub)
+
+@app.route('/api/streams')
+def streams():
+    """Per-client delivered/dropped frame counters for the MJPEG streams."""
+    return jsonify({'camera': camera_hub.stats(), 'yolo': yolo_hub.stats()})
 
 @app.route('/api/status')
 def status():
-    motor_data = {}
-    if state['motor']:
-        motor_data = {
-            'x': state['motor'].current_x,
-            'y': state['motor'].current_y,
-            'z': state['motor'].current_z,
-            'servo_1': state['motor'].current_servo_1,
-            'servo_2': state['motor'].current_servo_2,
-            'servo_3': state['motor'].current_servo_3,
-            'claw': state['motor'].current_claw
-        }
-
-    return jsonify({
-        'motor': motor_data,
-        'sensors': state['sensor_data'],
-        'target_env': state['target_env'],
-        'job_status': state['job_status']
-    })
+    return Response(status_store.snapshot_json(), mimetype='application/json')
+
+@app.route('/api/plants')
+def plants():
+    """Current plant table and, with ?x=&y=, detections within `radius` of that spot in the `last` N scans."""
+    store = ScanStore()
+    result = {'plants': {name: column.tolist() for name, column in store.plants().items()}}
+    if 'x' in request.args and 'y' in request.args:
+        near = store.near(request.args.get('x', type=float), request.args.get('y', type=float),
+                          request.args.get('radius', 0.5, type=float), request.args.get('last', 5, type=int))
+        result['near'] = {name: column.tolist() for name, column in near.items()}
+    return jsonify(result)
+
+@app.route('/api/plants/<int:plant_id>/history')
+def plant_history(plant_id):
+    """Growth metrics of one plant, oldest first; ?last=N keeps only the newest N captures."""
+    series = PlantHistory().series(plant_id, request.args.get('last', type=int))
+    return jsonify({'plant_id': plant_id, 'summary': PlantHistory().summary.get(plant_id, {}),
+                    'history': {name: series[name].tolist() for name in series.dtype.names}})
+
+@app.route('/api/images')
+def images():
+    """Newest-first page of archived plant photos; filter with ?plant_id=."""
+    total, entries = ImageArchive().page(request.args.get('offset', 0, type=int),
+                                         request.args.get('limit', 50, type=int),
+                                         request.args.get('plant_id', type=int))
+    return jsonify({'total': total, 'images': entries})
+
+@app.route('/api/images/<int:image_id>')
+@app.route('/api/images/<int:image_id>/<any(thumb):variant>')
+def image_file(image_id, variant=None):
+    entry = ImageArchive().get(image_id)
+    if entry is None:
+        abort(404)
+    return send_file(os.path.abspath(entry['thumb'] if variant else entry['path']))
 
 @app.route('/api/job/start', methods=['POST'])
 def start_job():
-    if state['job_status'] == 'running':
+    if JobRunner().current:
         return jsonify({'success': False, 'error': 'Job already running'})
-    state['job_control']['should_stop'] = False
-    state['job_control']['run_now'] = True
-    return jsonify({'success': True})
+    job = JobRunner().submit()
+    return jsonify({'success': True, 'job': job.as_dict()})
 
 @app.route('/api/job/stop', methods=['POST'])
 def stop_job():
-    state['job_control']['should_stop'] = True
+    JobRunner().cancel_all()
+    return jsonify({'success': True})
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    runner = JobRunner()
+    return jsonify({'registered': list(runner.registry), 'jobs': [job.as_dict() for job in runner.list_jobs()]})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    name = (request.json or {}).get('name')
+    try:
+        job = JobRunner().submit(name)
+    except KeyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify({'success': True, 'job': job.as_dict()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JobRunner().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not JobRunner().cancel(job_id):
+        return jsonify({'success': False, 'error': 'Job not found or already finished'}), 404
     return jsonify({'success': True})
 
+def manual_lease():
+    """The manual-control lease on the gantry, renewed or newly acquired; None if a job would not give it up.
+
+    Acquiring can wait up to MANUAL_ACQUIRE_TIMEOUT for a job's safe point. The process is not
+    monkey patched, so that wait runs on a real thread while the handler polls it with
+    socketio.sleep; under gevent the other clients keep being served meanwhile.
+    Concurrent commands share one pending acquisition.
+    """
+    lease = manual_control['lease']
+    if lease is not None and ResourceArbiter().renew(lease, MANUAL_LEASE):
+        return lease
+    with manual_control_lock:
+        pending = manual_control['pending']
+        if pending is None or pending.done():
+            # Preempts whatever job holds the gantry at its next safe point
+            pending = manual_control['pending'] = manual_acquirer.submit(
+                ResourceArbiter().acquire, 'manual', ('gantry',), PRIORITY_MANUAL,
+                timeout=MANUAL_ACQUIRE_TIMEOUT, hold=MANUAL_LEASE)
+    while not pending.done():
+        socketio.sleep(0.05)
+    lease = manual_control['lease'] = pending.result()
+    return lease
+
 @app.route('/api/motor/command', methods=['POST'])
 def motor_command():
     if not state['motor']:
         return jsonify({'success': False, 'error': 'Motor not initialized'})
+    if manual_lease() is None:
+        return jsonify({'success': False, 'error': 'Gantry busy'})
 
     data = request.json
     try:
@@ -100,15 +221,35 @@ def motor_command():
         state['motor'].current_servo_2 = data['servo_2']
         state['motor'].current_servo_3 = data['servo_3']
         state['motor'].current_claw = claw
+        state['motor'].publish_state()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/motor/release', methods=['POST'])
+def motor_release():
+    """End manual control early so queued jobs can have the gantry back."""
+    lease, manual_control['lease'] = manual_control['lease'], None
+    if lease is not None:
+        ResourceArbiter().release(lease)
+    return jsonify({'success': True})
+
+@app.route('/api/scheduler')
+def scheduler_status():
+    """Resource holders, waiters and utilization over `window` seconds (default one hour), plus upcoming timers."""
+    window = request.args.get('window', 3600, type=float)
+    return jsonify({**ResourceArbiter().stats(window), 'jobs': [job.as_dict() for job in JobRunner().list_jobs()],
+                    'timers': timers.pending()})
+
 @app.route('/api/serial/command', methods=['POST'])
 def serial_command():
     if not state['motor']:
         return jsonify({'success': False, 'error': 'Motor not initialized'})
 
+    # Raw commands move the gantry too, so they need the same lease as manual control
+    if manual_lease() is None:
+        return jsonify({'success': False, 'error': 'Gantry busy'})
+
     data = request.json
     try:
         state['motor'].ser.write((data['command'] + '\n').encode())
@@ -117,32 +258,51 @@ def serial_command():
         return jsonify({'success': False, 'error': str(e)})
 
 def serial_output_callback(line):
-    """Callback for serial output from motor controller."""
-    socketio.emit('serial_output', {'line': line})
+    """Callback for serial output from motor controller. Runs on the serial reader thread, so only buffers."""
+    serial_batcher.push(line)
+
+def flush_serial_output():
+    """Background task to send buffered serial output to clients in batches."""
+    while True:
+        lines, dropped = serial_batcher.drain()
+        if lines or dropped:
+            socketio.emit('serial_output', {'lines': lines, 'dropped': dropped, 'total_dropped': serial_batcher.dropped})
+        socketio.sleep(SERIAL_FLUSH_INTERVAL)
 
-def emit_status_updates():
-    """Background thread to emit status updates via WebSocket."""
+def publish_status_updates():
+    """Background task to push changed status fields to clients as soon as they change."""
+    last_version = status_store.version
     while True:
-        motor_data = {}
-        if state['motor']:
-            motor_data = {
-                'x': state['motor'].current_x,
-                'y': state['motor'].current_y,
-                'z': state['motor'].current_z,
-                'servo_1': state['motor'].current_servo_1,
-                'servo_2': state['motor'].current_servo_2,
-                'servo_3': state['motor'].current_servo_3,
-                'claw': state['motor'].current_claw
-            }
-
-        socketio.emit('status_update', {
-            'motor': motor_data,
-            'sensors': state['sensor_data'],
-            'target_env': state['target_env']
-        })
-        time.sleep(1)
-
-def run_flask_server():
+        if status_store.version != last_version:
+            last_version, changes = status_store.changes_since(last_version)
+            socketio.emit('status_update', {**changes, 'version': last_version})
+        socketio.sleep(STATUS_PUSH_INTERVAL)
+
+@socketio.on('connect')
+def on_connect():
+    """Send the full status to a newly connected client; it gets deltas after that."""
+    version, snapshot = status_store.snapshot()
+    emit('status_update', {**snapshot, 'version': version})
+
+@socketio.on('job_submit')
+def on_job_submit(data):
+    try:
+        job = JobRunner().submit((data or {}).get('name'))
+    except KeyError as e:
+        return {'success': False, 'error': str(e)}
+    return {'success': True, 'job': job.as_dict()}
+
+@socketio.on('job_cancel')
+def on_job_cancel(data):
+    job_id = (data or {}).get('id')
+    cancelled = JobRunner().cancel_all() if job_id is None else int(JobRunner().cancel(job_id))
+    return {'success': bool(cancelled), 'cancelled': cancelled}
+
+def run_flask_server(host='0.0.0.0', port=5000):
     """Run Flask server in a separate thread."""
-    threading.Thread(target=emit_status_updates, daemon=True).start()
-    socketio.run(app, allow_unsafe_werkzeug=True, host='0.0.0.0', port=5000, debug=False, use_reloader=False)
+    socketio.start_background_task(publish_status_updates)
+    socketio.start_background_task(flush_serial_output)
+    if socketio.async_mode == 'threading':
+        socketio.run(app, allow_unsafe_werkzeug=True, host=host, port=port, debug=False, use_reloader=False)
+    else:
+        socketio.run(app, host=host, port=port, debug=False, use_reloader=False, log_output=False)
@@ -1,86 +1,151 @@
+import json
 import os
-import re
 import threading
 import time
 import cv2
-import numpy as np
 from cv2_enumerate_cameras import enumerate_cameras
 from dotenv import load_dotenv
 from loguru import logger
-import Common
 from Agent.PlantRecognition import PlantRecognitionAgent
 from Agent.PlantRequirements import PlantRequirementsAgent
 from Common import GlobalState, PlantBoxSerial
-from Common import scheduler
+from Common import Checkpointer, JobRunner, scheduler
+from Common.change_gate import ChangeGate
+from Common.resource_arbiter import PRIORITY_PICK
+from Common.scan_store import ScanStore
+from Common.startup import Startup
 from EnvActuator import ActuatorManager
 from Jobs.pick import pick
 from MotorContol.motor_control import MotorControl
-from Sensors.packed_sensor_input import get_packed_sensor_input
-from Yolo import detect_plants, get_model
-from Common.dbscan import cluster_boxes_dbscan
+from Sensors import SensorStream
+from Yolo import InferenceService
 from app import run_flask_server, state as flask_state, serial_output_callback
-from app import socketio
-from Common.cluster_merge import merge_clusters_across_positions
-from Jobs import experiment_1, experiment_2, init_plant_scan, init_plant_scan, job
+from Jobs import experiment_1, experiment_2, init_plant_scan, job
+
+CHECKPOINT_INTERVAL = 5  # minutes between checkpoints (only written when something changed)
+JOB_INTERVAL = 6 * 3600  # seconds between periodic plant jobs
+CAMERA_NAME = os.getenv('PLANTBOX_CAMERA', 'MF500 camera')
+CAMERA_CACHE = 'Data/camera.json'  # camera name -> last index it was found at
+
+
+def open_camera(name: str = CAMERA_NAME, cache_path: str = CAMERA_CACHE) -> cv2.VideoCapture:
+    """Open the camera called `name`. Its index is cached, so the slow device enumeration only
+    runs when the cached index no longer opens. Never prompts: if the camera is not found,
+    PLANTBOX_CAMERA_INDEX picks one of the listed indexes."""
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    if name in cache:
+        cam = cv2.VideoCapture(cache[name])
+        if cam.isOpened():
+            return cam
+        cam.release()
+
+    cameras = list(enumerate_cameras())
+    index = next((camera_info.index for camera_info in cameras if camera_info.name == name), None)
+    if index is None:
+        for camera_info in cameras:
+            logger.info(f"Camera index: {camera_info.index}  Name: {camera_info.name}")
+        if not os.getenv('PLANTBOX_CAMERA_INDEX'):
+            raise IOError(f"Camera '{name}' not found; set PLANTBOX_CAMERA_INDEX to one of the indexes above")
+        index = int(os.getenv('PLANTBOX_CAMERA_INDEX'))
+    else:
+        cache[name] = index
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+
+    cam = cv2.VideoCapture(index)
+    if not cam.isOpened():
+        raise IOError(f"Cannot open camera {index}")
+    return cam
+
+
+def open_serial() -> PlantBoxSerial:
+    ser = PlantBoxSerial(port='COM7', baudrate=115200, serial_callback=serial_output_callback)
+    ser.add_listener(SensorStream().feed)
+    return ser
+
+
+def share(key: str, value):
+    """Hand a device to the dashboard as soon as it is up."""
+    flask_state[key] = value
+    return value
+
+
+def restore_checkpoint(runner: JobRunner) -> bool:
+    """Register what survives a restart and load it. The plant map itself is already on disk in ScanStore."""
+    checkpointer = Checkpointer()
+    if manager is not None:
+        checkpointer.register('actuators', manager.state, manager.restore)
+    checkpointer.register('target_env', lambda: flask_state['target_env'],
+                          lambda value: flask_state.__setitem__('target_env', value))
+    checkpointer.register('jobs', lambda: runner.last_success, runner.last_success.update)
+    checkpointer.register('change_gate', ChangeGate().state, ChangeGate().restore)
+    return checkpointer.restore()
 
 def main():
-    # Start Flask server in background thread
-    flask_thread = threading.Thread(target=run_flask_server, daemon=True)
-    flask_thread.start()
-    logger.info("Flask server started on http://0.0.0.0:5000")
+    runner = JobRunner()
+    runner.register('init_plant_scan', lambda: init_plant_scan(cam, motor, flask_state, recognition_agent,
+                                                               requirements_agent, manager), covers=('job',))
+    runner.register('job', lambda: job(cam, motor, manager, flask_state, recognition_agent, requirements_agent),
+                    default=True)
+    runner.register('pick', lambda: pick(cam, motor, manager, flask_state, recognition_agent, requirements_agent),
+                    priority=PRIORITY_PICK)
+    runner.register('experiment_1', lambda: experiment_1(cam, motor, flask_state))
+    runner.register('experiment_2', lambda: experiment_2(cam, motor, flask_state))
 
-    pick(cam, motor, manager, flask_state,recognition_agent, requirements_agent, socketio)
+    warm = restore_checkpoint(runner) and bool(ScanStore().plant_positions())
+    scheduler.every(CHECKPOINT_INTERVAL).minutes.do(Checkpointer().save)
 
-    """init_plant_scan(cam, motor, flask_state, socketio, recognition_agent, requirements_agent, manager)
+    # A warm restart with a known plant map skips the full bed scan; pick runs on request only
+    if not warm:
+        runner.submit('init_plant_scan')
+    scheduler.every(1).minutes.do(runner.submit_if_due, 'job', JOB_INTERVAL)
 
-    task = scheduler.every(6).hours.do(lambda: job(cam, motor, manager, flask_state,recognition_agent, requirements_agent, socketio))
     try:
         while True:
-            if flask_state['job_control'].get('run_now'):
-                flask_state['job_control']['run_now'] = False
             scheduler.run_pending()
-            # Update sensor data
-            temp, humidity, soil_humidity = get_packed_sensor_input()
-            flask_state['sensor_data'] = {
-                'temperature': temp,
-                'humidity': humidity,
-                'soil_humidity': soil_humidity
-            }
             time.sleep(1)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
+        runner.cancel_all()
+        Checkpointer().save()
         GlobalState().is_shutting_down = True
-        cam.release()"""
+        if cam is not None:
+            cam.release()
 
 if __name__ == "__main__":
     load_dotenv()
 
-    ser = Common.PlantBoxSerial(port='COM7', baudrate=115200, serial_callback=serial_output_callback)
-
-    cam_index = -1
-    for cam in enumerate_cameras():
-        if cam.name == "MF500 camera":
-            cam_index = cam.index
-            break
-
-    if cam_index == -1:
-        for camera_info in enumerate_cameras():
-            logger.info(f"Camera index: {camera_info.index}  Name: {camera_info.name}")
-        cam_index = int(input("Please enter the camera index to use and press Enter: "))
-
-    cam = cv2.VideoCapture(cam_index)
-
-    recognition_agent = PlantRecognitionAgent(api_key=os.getenv("OPENAI_API_KEY"),
-                                              base_url=os.getenv("OPENAI_API_BASE"))
-    requirements_agent = PlantRequirementsAgent(api_key=os.getenv("OPENAI_API_KEY"),
-                                                base_url=os.getenv("OPENAI_API_BASE"))
-
-    manager = ActuatorManager()
+    # The dashboard comes up first; devices, agents and the YOLO workers load behind it
+    flask_thread = threading.Thread(target=run_flask_server, daemon=True)
+    flask_thread.start()
+    logger.info("Flask server started on http://0.0.0.0:5000")
+    threading.Thread(target=InferenceService, name='inference-warmup', daemon=True).start()
 
-    motor = MotorControl(ser, 10, 25, 0)
+    # Devices and agents come up concurrently; /api/status shows each one's progress under 'startup'
+    startup = Startup()
+    startup.add('serial', open_serial, timeout=10)
+    startup.add('camera', lambda: share('camera', open_camera()), timeout=20)
+    startup.add('recognition_agent', lambda: PlantRecognitionAgent(api_key=os.getenv("OPENAI_API_KEY"),
+                                                                   base_url=os.getenv("OPENAI_API_BASE")), timeout=30)
+    startup.add('requirements_agent', lambda: PlantRequirementsAgent(api_key=os.getenv("OPENAI_API_KEY"),
+                                                                     base_url=os.getenv("OPENAI_API_BASE")), timeout=30)
+    # The actuators share the PlantBoxSerial singleton, which open_serial must create with the real port
+    startup.add('actuators', ActuatorManager, requires=('serial',), timeout=10)
+    startup.add('motor', lambda: share('motor', MotorControl(startup.get('serial'), 10, 25, 0)), requires=('serial',),
+                timeout=30)
+    devices = startup.run()
 
-    # Share camera and motor with Flask
-    flask_state['camera'] = cam
-    flask_state['motor'] = motor
+    ser = devices['serial']
+    cam = devices['camera']
+    recognition_agent = devices['recognition_agent']
+    requirements_agent = devices['requirements_agent']
+    manager = devices['actuators']
+    motor = devices['motor']
 
     main()